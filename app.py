@@ -3,14 +3,23 @@ FastAPI приложение для TinaBorke.Art
 Упрощенная версия с исправлениями для запуска
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, Depends, UploadFile, File
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, FileResponse, Response
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
+from collections import OrderedDict
+import contextvars
+import copy
+import functools
+import hashlib
 import logging
+import logging.handlers
+import atexit
+import base64
+import queue
 import asyncio
 import secrets
 from typing import List, Optional
@@ -18,17 +27,41 @@ from datetime import datetime, timezone, timedelta
 import os
 import html
 from pathlib import Path
-from urllib.parse import urljoin
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit
+from email.utils import formatdate, parsedate_to_datetime
 from xml.sax.saxutils import escape as xml_escape
 from pydantic import BaseModel, field_validator
 import aiosqlite
+import aiofiles
+import aiofiles.os
+import sqlite3
 import httpx
 import json
 import sys
 import re
+import time
 from uuid import uuid4
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 
+try:
+    import structlog
+except ImportError:  # structlog нужен только для LOG_FORMAT=json
+    structlog = None
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess as prometheus_multiprocess
+except ImportError:  # prometheus-client нужен только для /metrics
+    prometheus_client = None
+    prometheus_multiprocess = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow нужен только для адаптивных вариантов изображений
+    Image = None
+    ImageOps = None
+
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
@@ -39,17 +72,18 @@ def get_moscow_time():
     return datetime.now(moscow_tz)
 
 # ========== НАСТРОЙКА ЛОГИРОВАНИЯ ==========
+EMOJI_PATTERN = re.compile("["
+    u"\U0001F600-\U0001F64F"  # emoticons
+    u"\U0001F300-\U0001F5FF"  # symbols & pictographs
+    u"\U0001F680-\U0001F6FF"  # transport & map symbols
+    u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
+    u"\U00002700-\U000027BF"  # dingbats
+    u"\U0001F900-\U0001F9FF"  # supplemental symbols and pictographs
+    "]+", flags=re.UNICODE)
+
 # Функция для удаления emoji из строк
 def remove_emoji(text):
-    emoji_pattern = re.compile("["
-        u"\U0001F600-\U0001F64F"  # emoticons
-        u"\U0001F300-\U0001F5FF"  # symbols & pictographs
-        u"\U0001F680-\U0001F6FF"  # transport & map symbols
-        u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-        u"\U00002700-\U000027BF"  # dingbats
-        u"\U0001F900-\U0001F9FF"  # supplemental symbols and pictographs
-        "]+", flags=re.UNICODE)
-    return emoji_pattern.sub(r'', text)
+    return EMOJI_PATTERN.sub(r'', text)
 
 class NoEmojiFormatter(logging.Formatter):
     def format(self, record):
@@ -74,30 +108,69 @@ class NoEmojiFormatter(logging.Formatter):
 
         return result
 
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_LINE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+def build_log_formatters() -> tuple[logging.Formatter, logging.Formatter]:
+    """Форматтеры для консоли и файла: текстовые или JSON через structlog"""
+    if LOG_FORMAT == "json" and structlog is not None:
+        json_formatter = structlog.stdlib.ProcessorFormatter(
+            processor=structlog.processors.JSONRenderer(ensure_ascii=False),
+            foreign_pre_chain=[
+                structlog.stdlib.add_logger_name,
+                structlog.stdlib.add_log_level,
+                structlog.processors.TimeStamper(fmt="iso"),
+                # traceback из exc_info уходит в отдельное поле exception, а не склеивается с event
+                structlog.processors.format_exc_info,
+            ],
+        )
+        return json_formatter, json_formatter
+    # В консоли без emoji, в файле emoji работают нормально
+    return NoEmojiFormatter(LOG_LINE_FORMAT), logging.Formatter(LOG_LINE_FORMAT)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler без форматирования в event loop.
+
+    Стандартный prepare() форматирует запись и traceback еще до постановки в очередь и склеивает их в msg.
+    Здесь в msg подставляются только аргументы (объекты из args могут измениться, пока запись в очереди),
+    а exc_info остается в записи: traceback рисуют форматтеры консоли и файла в потоке QueueListener"""
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
 # Настройка логирования
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger.setLevel(LOG_LEVEL)
 
-# Создаем handler для консоли
+# Форматирование, вывод в консоль и запись в файл идут в отдельном потоке QueueListener,
+# а в event loop остается только быстрая постановка записи в очередь
+console_formatter, file_formatter = build_log_formatters()
 console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(logging.INFO)
+console_handler.setFormatter(console_formatter)
+log_handlers = [console_handler]
 
-# Устанавливаем форматтер без emoji
-formatter = NoEmojiFormatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-console_handler.setFormatter(formatter)
+if LOG_FILE:
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+    )
+    file_handler.setFormatter(file_formatter)
+    log_handlers.append(file_handler)
 
-# Добавляем handler к логгеру
-logger.addHandler(console_handler)
+log_queue = queue.SimpleQueue()
+logger.addHandler(DeferredQueueHandler(log_queue))
+logger.propagate = False
+log_listener = logging.handlers.QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
 
-# Также пишем в файл (там emoji работают нормально)
-file_handler = logging.FileHandler('app.log', encoding='utf-8')
-file_handler.setLevel(logging.INFO)
-file_handler.setFormatter(logging.Formatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-))
-logger.addHandler(file_handler)
+if LOG_FORMAT == "json" and structlog is None:
+    logger.warning("LOG_FORMAT=json требует пакет structlog, используется текстовый формат")
 
 # ========== КОНФИГУРАЦИЯ ПРИЛОЖЕНИЯ ==========
 class Settings:
@@ -112,16 +185,64 @@ class Settings:
     TELEGRAM_API_HASH = os.getenv("TELEGRAM_API_HASH", "")
     TELEGRAM_SESSION_NAME = os.getenv("TELEGRAM_SESSION_NAME", "tinaborke")
     TELEGRAM_IMPORT_MODE = os.getenv("TELEGRAM_IMPORT_MODE", "bot_api")
+    TELEGRAM_IMPORT_INTERVAL = int(os.getenv("TELEGRAM_IMPORT_INTERVAL", "600"))
+    TELEGRAM_LONG_POLL_TIMEOUT = int(os.getenv("TELEGRAM_LONG_POLL_TIMEOUT", "0"))
     BASE_URL = os.getenv("BASE_URL", "").rstrip("/")
     DATABASE_URL = os.getenv("DATABASE_URL", "tinaborke.db")
     SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
+    DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+    DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+    DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+    CACHE_VERSION_CHECK_INTERVAL = float(os.getenv("CACHE_VERSION_CHECK_INTERVAL", "1.0"))
+    PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "512"))
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+    TELEGRAM_DOWNLOAD_CONCURRENCY = int(os.getenv("TELEGRAM_DOWNLOAD_CONCURRENCY", "4"))
+    TELEGRAM_DOWNLOAD_RETRIES = int(os.getenv("TELEGRAM_DOWNLOAD_RETRIES", "3"))
+    TELEGRAM_SEND_TIMEOUT = float(os.getenv("TELEGRAM_SEND_TIMEOUT", "10"))
+    TELEGRAM_SEND_RATE = float(os.getenv("TELEGRAM_SEND_RATE", "25"))
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+    OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+    OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "5"))
+    OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "3600"))
+    SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+    ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "30"))
+    BLOG_PAGE_SIZE = int(os.getenv("BLOG_PAGE_SIZE", "12"))
+    PORTFOLIO_PAGE_SIZE = int(os.getenv("PORTFOLIO_PAGE_SIZE", "24"))
+    STATIC_INDEX_REFRESH_INTERVAL = float(os.getenv("STATIC_INDEX_REFRESH_INTERVAL", "60"))
 
 settings = Settings()
 security = HTTPBasic()
+
+def sqlite_path(url: str) -> str:
+    """Путь к файлу SQLite из DATABASE_URL: подходит и обычный путь, и адрес вида sqlite:///./data/tinaborke.db"""
+    if url.startswith("sqlite:///"):
+        return url[len("sqlite:///"):]
+    if "://" in url:
+        raise ValueError(f"DATABASE_URL должен указывать на файл SQLite, получено: {url.split('://', 1)[0]}://...")
+    return url
+
+DATABASE_PATH = sqlite_path(settings.DATABASE_URL)
 ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+IMAGE_VARIANT_WIDTHS = (480, 960, 1600)
+MAX_IMAGE_BYTES = 8 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 256 * 1024
 BLOG_CATEGORIES = ("Советы", "Образы и заметки", "Свадьба", "Фотосессии")
 BLOG_DEFAULT_CATEGORY = "Образы и заметки"
 BLOG_DRAFT_TITLE = "Образы и заметки визажиста — требуется заголовок"
+# Служебные настройки, которые не выводятся на публичных страницах и не сбрасывают кэш страниц
+INTERNAL_SETTINGS_KEYS = {
+    "telegram_import_last_run", "telegram_import_last_count", "telegram_import_last_error", "telegram_import_offset",
+}
+TELEGRAM_UPDATES_LIMIT = 100
+# getUpdates выполняет один процесс: запуск импорта берет аренду в worker_leases на столько секунд
+# (плюс таймаут long polling) и продлевает ее перед каждой пачкой; аренда упавшего процесса истекает сама
+TELEGRAM_IMPORT_LEASE = "telegram_import"
+TELEGRAM_IMPORT_LEASE_SECONDS = 300
+# Как часто воркер, чью попытку импорта опередил другой процесс, проверяет аренду в режиме long polling
+TELEGRAM_IMPORT_STANDBY_INTERVAL = 15
 
 def slugify(value: str) -> str:
     """Простой slug для ЧПУ без внешних зависимостей."""
@@ -167,7 +288,7 @@ def absolute_asset_url(path: str = "", request: Optional[Request] = None) -> str
     if value.startswith(("http://", "https://")):
         return value
     local_path = Path(value.lstrip("/"))
-    if not local_path.exists():
+    if not static_assets.exists(str(local_path)):
         return ""
     return absolute_url("/" + str(local_path).replace("\\", "/"), request)
 
@@ -184,7 +305,8 @@ def clean_json_ld(value):
     return value
 
 def json_ld_dump(payload) -> str:
-    return json.dumps(clean_json_ld(payload), ensure_ascii=False, separators=(",", ":"))
+    with timed_phase("jsonld"):
+        return json.dumps(clean_json_ld(payload), ensure_ascii=False, separators=(",", ":"))
 
 def build_breadcrumbs(items: list[dict], request: Optional[Request] = None) -> dict:
     return {
@@ -238,6 +360,63 @@ def format_ru_datetime(value: str) -> str:
             continue
     return text
 
+def encode_cursor(*values) -> str:
+    """Курсор страницы: значения ключа сортировки граничной записи в base64url"""
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(value: Optional[str], size: int = 2) -> Optional[list]:
+    """Разбирает курсор; для испорченного или чужого значения возвращает None (первая страница)"""
+    if not value:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(item, (int, str)) for item in values):
+        return None
+    return values
+
+def page_link(path: str, **params) -> str:
+    query = urlencode({key: value for key, value in params.items() if value})
+    return f"{path}?{query}" if query else path
+
+# FTS5 не знает русской морфологии: слово запроса обрезается до основы и ищется по префиксу,
+# так "свадебный макияж" находит "свадебного макияжа"
+SEARCH_ENDINGS = tuple(sorted((
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ость", "ости",
+    "ых", "их", "ую", "юю", "ая", "яя", "ое", "ее", "ые", "ие", "ый", "ий", "ой", "ей",
+    "ом", "ем", "ам", "ям", "ах", "ях", "ов", "ев", "ия", "ью", "ья", "ье",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+), key=len, reverse=True))
+SEARCH_MIN_STEM = 3
+SEARCH_MAX_TERMS = 8
+SEARCH_QUERY_MAX_LENGTH = 200
+SEARCH_RESULTS_LIMIT = 20
+SEARCH_API_MAX_LIMIT = 50
+# Метки совпадений в snippet(): управляющие символы не встречаются в тексте и переживают html.escape
+SEARCH_MARK_START, SEARCH_MARK_END = "\x02", "\x03"
+
+def fold_search_text(value: str) -> str:
+    return (value or "").replace("ё", "е").replace("Ё", "Е")
+
+def search_stem(word: str) -> str:
+    for ending in SEARCH_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= SEARCH_MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+def search_terms(text: str) -> list[str]:
+    """Слова запроса в синтаксисе FTS5 MATCH: основы в кавычках с префиксным поиском"""
+    words = re.findall(r"\w+", fold_search_text(text[:SEARCH_QUERY_MAX_LENGTH]).lower())[:SEARCH_MAX_TERMS]
+    return [f'"{search_stem(word)}"*' for word in words]
+
+def search_snippet_html(snippet: str) -> str:
+    """Фрагмент из snippet() в безопасный HTML: разметка Markdown убирается, совпадения выделяются <mark>"""
+    text = re.sub(r"[*_#>`]+", "", snippet or "")
+    text = html.escape(re.sub(r"\s+", " ", text).strip())
+    return text.replace(SEARCH_MARK_START, "<mark>").replace(SEARCH_MARK_END, "</mark>")
+
 def extract_price_number(value: str) -> str:
     digits = re.sub(r"[^\d]", "", value or "")
     return digits or ""
@@ -247,9 +426,9 @@ def default_og_image_url(request: Optional[Request] = None) -> str:
         Path("static/images/photo_2026-06-08_20-36-17.jpg"),
         Path("static/images/android-chrome-512x512.png"),
     ]
-    for candidate in candidates:
-        if candidate.exists():
-            return absolute_url("/" + str(candidate).replace("\\", "/"), request)
+    existing = next((candidate for candidate in candidates if static_assets.exists(str(candidate))), None)
+    if existing is not None:
+        return absolute_url("/" + str(existing).replace("\\", "/"), request)
     return ""
 
 def get_social_links(site_settings: dict) -> list[dict]:
@@ -298,6 +477,57 @@ def parse_telegram_blog_text(raw_text: str) -> dict:
         body = raw_text.strip()
     return {"title": title, "category": category, "text": body}
 
+def admin_post_label(post: dict) -> str:
+    return (post.get("title") or "").strip() or plain_excerpt(post.get("text_markdown", ""), 90) or f"Публикация {post['id']}"
+
+def format_booking_message(booking: dict) -> str:
+    """Текст уведомления о заявке для Telegram"""
+    return f"""
+Новая заявка на TinaBorke.Art
+
+Имя: {booking['name']}
+Телефон: {booking['phone']}
+Услуга: {booking.get('service') or 'Не указана'}
+Дата: {booking.get('date') or 'Не указана'}
+Сообщение: {booking.get('message') or 'Не указано'}
+
+Время заявки: {booking.get('created_at', 'Не указано')} (МСК)
+ID заявки: {booking['id']}
+        """
+
+def render_image_variants(image_path: str, widths: tuple = IMAGE_VARIANT_WIDTHS) -> list[dict]:
+    """Сохраняет WebP-копии изображения нужной ширины в подпапку variants; выполняется в пуле процессов"""
+    source = Path(image_path.lstrip("/"))
+    target_dir = source.parent / "variants"
+    target_dir.mkdir(parents=True, exist_ok=True)
+    variants = []
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        target_widths = sorted({width for width in widths if width < image.width} | {image.width})
+        for width in target_widths:
+            resized = image if width == image.width else image.resize(
+                (width, max(1, round(image.height * width / image.width))),
+                Image.LANCZOS,
+            )
+            target = target_dir / f"{source.stem}-{width}.webp"
+            resized.save(target, "WEBP", quality=80, method=4)
+            variants.append({
+                "width": width,
+                "format": "webp",
+                "variant_path": "/" + str(target).replace("\\", "/"),
+            })
+    return variants
+
+image_executor: Optional[ProcessPoolExecutor] = None
+
+def get_image_executor() -> ProcessPoolExecutor:
+    global image_executor
+    if image_executor is None:
+        image_executor = ProcessPoolExecutor(max_workers=max(1, settings.IMAGE_WORKERS))
+    return image_executor
+
 def require_admin(credentials: HTTPBasicCredentials = Depends(security)):
     expected_username = settings.ADMIN_USERNAME
     expected_password = settings.ADMIN_PASSWORD
@@ -314,6 +544,190 @@ def require_admin(credentials: HTTPBasicCredentials = Depends(security)):
 # Логируем настройки (без чувствительных данных)
 logger.info(f"Конфигурация загружена: DB={settings.DATABASE_URL}, Telegram настроен: {bool(settings.TELEGRAM_BOT_TOKEN)}")
 
+# ========== МЕТРИКИ PROMETHEUS ==========
+class NoopMetric:
+    """Заглушка метрики, если prometheus-client не установлен"""
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+def make_metric(kind: str, name: str, documentation: str, labelnames: tuple = (), **kwargs):
+    if prometheus_client is None:
+        return NoopMetric()
+    return getattr(prometheus_client, kind)(name, documentation, labelnames, **kwargs)
+
+HTTP_REQUEST_DURATION = make_metric(
+    "Histogram", "http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route", "status"),
+)
+DB_QUERY_DURATION = make_metric(
+    "Histogram", "db_query_duration_seconds", "Время выполнения методов Database", ("method",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+PAGE_CACHE_REQUESTS = make_metric(
+    "Counter", "page_cache_requests_total", "Обращения к кэшу HTML-страниц", ("result",),
+)
+UPLOAD_SIZE_BYTES = make_metric(
+    "Histogram", "upload_size_bytes", "Размер загруженных через админку файлов",
+    buckets=(64 * 1024, 256 * 1024, 512 * 1024, 1024 * 1024, 2 * 1024 * 1024, 4 * 1024 * 1024, MAX_IMAGE_BYTES),
+)
+TELEGRAM_IMPORT_DURATION = make_metric(
+    "Histogram", "telegram_import_duration_seconds", "Длительность импорта из Telegram", ("outcome",),
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+TELEGRAM_IMPORTED_POSTS = make_metric(
+    "Counter", "telegram_imported_posts_total", "Посты блога, созданные импортом из Telegram",
+)
+TELEGRAM_NOTIFICATION_DURATION = make_metric(
+    "Histogram", "telegram_notification_duration_seconds", "Время отправки одного уведомления в Telegram", ("outcome",),
+)
+TELEGRAM_NOTIFICATIONS = make_metric(
+    "Counter", "telegram_notifications_total", "Итоги обработки уведомлений из outbox", ("outcome",),
+)
+
+def render_metrics() -> tuple[bytes, str]:
+    """Метрики в текстовом формате Prometheus; под gunicorn собираются со всех воркеров"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = prometheus_client.CollectorRegistry()
+        prometheus_multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+def observe_db_methods(cls):
+    """Оборачивает публичные async-методы класса замером времени с меткой method"""
+    def wrap(name, method):
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                DB_QUERY_DURATION.labels(name).observe(time.perf_counter() - started)
+        return timed
+
+    for name, value in list(vars(cls).items()):
+        if not name.startswith("_") and asyncio.iscoroutinefunction(value):
+            setattr(cls, name, wrap(name, value))
+    return cls
+
+# ========== SERVER-TIMING ==========
+class RequestTimings:
+    """Время фаз запроса по настенным часам. Блоки одной фазы, идущие параллельно (asyncio.gather),
+    не складываются: фаза считается от входа в первый блок до выхода из последнего, поэтому db не превышает total"""
+    def __init__(self):
+        self.totals: dict[str, float] = {}
+        self._active: dict[str, int] = {}
+        self._started: dict[str, float] = {}
+
+    def enter(self, phase: str):
+        if not self._active.get(phase):
+            self._started[phase] = time.perf_counter()
+        self._active[phase] = self._active.get(phase, 0) + 1
+
+    def exit(self, phase: str):
+        self._active[phase] -= 1
+        if not self._active[phase]:
+            self.totals[phase] = self.totals.get(phase, 0.0) + time.perf_counter() - self._started.pop(phase)
+
+# Фазы текущего запроса: db, fs, jsonld, template. Объект создается в middleware и общий для задач gather
+request_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+@contextmanager
+def timed_phase(phase: str):
+    """Добавляет время блока к фазе текущего запроса; вне запроса ничего не делает"""
+    timings = request_timings.get()
+    if timings is None:
+        yield
+        return
+    timings.enter(phase)
+    try:
+        yield
+    finally:
+        timings.exit(phase)
+
+def server_timing_header(timings: RequestTimings, total: float) -> str:
+    parts = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in timings.totals.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+# ========== ИНДЕКС СТАТИЧЕСКИХ ФАЙЛОВ ==========
+class StaticAssetIndex:
+    """Множество путей файлов в static/ для проверок существования без stat() на каждый рендер.
+
+    Файл, которого нет в индексе, проверяется на диске один раз: так находятся загрузки других воркеров.
+    Отсутствующие файлы запоминаются до следующего refresh; удаления на диске ловит опрос mtime каталогов.
+    """
+    def __init__(self, root: str = "static"):
+        self.root = root
+        self._paths: set[str] = set()
+        self._missing: set[str] = set()
+        self._dir_mtimes: Optional[dict] = None
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return Path((path or "").strip().lstrip("/")).as_posix()
+
+    def _scan(self) -> tuple[set, dict]:
+        paths, dir_mtimes = set(), {}
+        for dirpath, _, filenames in os.walk(self.root):
+            dir_mtimes[dirpath] = os.stat(dirpath).st_mtime_ns
+            # Файлы с точкой в начале — недописанные .part при загрузке
+            paths.update(Path(dirpath, name).as_posix() for name in filenames if not name.startswith("."))
+        return paths, dir_mtimes
+
+    def _dirs_changed(self, dir_mtimes: dict) -> bool:
+        for dirpath, mtime in dir_mtimes.items():
+            try:
+                if os.stat(dirpath).st_mtime_ns != mtime:
+                    return True
+            except FileNotFoundError:
+                return True
+        return False
+
+    async def refresh(self) -> bool:
+        """Пересобирает индекс, если изменилось содержимое каталогов; обход диска идет в отдельном потоке"""
+        if self._dir_mtimes is not None and not await asyncio.to_thread(self._dirs_changed, self._dir_mtimes):
+            return False
+        paths, dir_mtimes = await asyncio.to_thread(self._scan)
+        self._paths, self._dir_mtimes = paths, dir_mtimes
+        self._missing = set()
+        return True
+
+    def add(self, path: str):
+        key = self._key(path)
+        self._paths.add(key)
+        self._missing.discard(key)
+
+    def discard(self, path: str):
+        """Убирает из индекса файл, который удалило само приложение, не дожидаясь опроса каталогов"""
+        key = self._key(path)
+        self._paths.discard(key)
+        self._missing.add(key)
+
+    def exists(self, path: str) -> bool:
+        key = self._key(path)
+        if key in self._paths:
+            return True
+        if key in self._missing:
+            return False
+        with timed_phase("fs"):
+            found = Path(key).is_file()
+        if found:
+            self._paths.add(key)
+        else:
+            self._missing.add(key)
+        return found
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+static_assets = StaticAssetIndex("static")
+
 # ========== МОДЕЛИ ДАННЫХ ==========
 class BookingCreate(BaseModel):
     """Модель для создания заявки"""
@@ -340,242 +754,496 @@ class BookingCreate(BaseModel):
             raise ValueError('Некорректный номер телефона')
         return v
 
+# ========== ПУЛ СОЕДИНЕНИЙ SQLITE ==========
+def sqlite_connection_pragmas() -> list[str]:
+    """PRAGMA, которые применяются к каждому соединению пула"""
+    return [
+        f"PRAGMA busy_timeout = {int(settings.DB_BUSY_TIMEOUT_MS)}",
+        "PRAGMA synchronous = NORMAL",
+        f"PRAGMA cache_size = -{int(settings.DB_CACHE_SIZE_KB)}",
+        f"PRAGMA mmap_size = {int(settings.DB_MMAP_SIZE)}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+
+class SQLitePool:
+    """Пул долгоживущих aiosqlite-соединений: несколько читающих и один пишущий"""
+    def __init__(self, db_path: str, read_size: int = 4, timeout: float = 10.0):
+        self.db_path = db_path
+        self.read_size = max(1, read_size)
+        self.timeout = timeout
+        self._readers: Optional[asyncio.Queue] = None
+        self._all_readers: list = []
+        self._writer = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._open_lock = asyncio.Lock()
+        self._is_open = False
+
+    async def _connect(self):
+        conn = await aiosqlite.connect(self.db_path, timeout=settings.DB_BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = aiosqlite.Row
+        for pragma in sqlite_connection_pragmas():
+            await conn.execute(pragma)
+        return conn
+
+    async def open(self):
+        async with self._open_lock:
+            if self._is_open:
+                return
+            self._writer = await self._connect()
+            # WAL сохраняется в файле базы: читатели больше не ждут писателя, в том числе из других воркеров
+            async with self._writer.execute("PRAGMA journal_mode = WAL") as cursor:
+                journal_mode = (await cursor.fetchone())[0]
+            if str(journal_mode).lower() != "wal":
+                logger.warning(f"SQLite не переключился в WAL, текущий режим: {journal_mode}")
+            self._readers = asyncio.Queue()
+            self._all_readers = []
+            for _ in range(self.read_size):
+                conn = await self._connect()
+                self._all_readers.append(conn)
+                self._readers.put_nowait(conn)
+            # asyncio.Lock будит ожидающих по порядку, поэтому служит очередью записей внутри воркера
+            self._write_lock = asyncio.Lock()
+            self._is_open = True
+            logger.info(f"Пул SQLite открыт: читающих соединений {self.read_size}, пишущее 1")
+
+    async def close(self):
+        async with self._open_lock:
+            if not self._is_open:
+                return
+            self._is_open = False
+            try:
+                await self._writer.execute("PRAGMA optimize")
+            except Exception as e:
+                logger.warning(f"PRAGMA optimize не выполнен: {e}")
+            for conn in self._all_readers + [self._writer]:
+                try:
+                    await conn.close()
+                except Exception as e:
+                    logger.warning(f"Ошибка закрытия соединения SQLite: {e}")
+            self._all_readers = []
+            self._readers = None
+            self._writer = None
+            logger.info("Пул SQLite закрыт")
+
+    async def _replace_reader(self, broken):
+        try:
+            await broken.close()
+        except Exception:
+            pass
+        fresh = await self._connect()
+        self._all_readers = [fresh if conn is broken else conn for conn in self._all_readers]
+        return fresh
+
+    async def _replace_writer(self):
+        try:
+            await self._writer.close()
+        except Exception:
+            pass
+        self._writer = await self._connect()
+
+    @asynccontextmanager
+    async def reader(self):
+        """Выдает свободное читающее соединение, при обрыве заменяет его новым"""
+        if not self._is_open:
+            await self.open()
+        with timed_phase("db"):
+            conn = await asyncio.wait_for(self._readers.get(), timeout=self.timeout)
+            try:
+                yield conn
+            except (sqlite3.ProgrammingError, ValueError):
+                conn = await self._replace_reader(conn)
+                raise
+            finally:
+                self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self):
+        """Выдает единственное пишущее соединение; записи выполняются строго по очереди"""
+        if not self._is_open:
+            await self.open()
+        with timed_phase("db"):
+            await asyncio.wait_for(self._write_lock.acquire(), timeout=self.timeout)
+            try:
+                yield self._writer
+            except Exception:
+                try:
+                    await self._writer.rollback()
+                except Exception:
+                    await self._replace_writer()
+                raise
+            finally:
+                self._write_lock.release()
+
+    async def check_health(self) -> dict:
+        """Проверяет простаивающие соединения запросом SELECT 1 и пересоздает сломанные"""
+        if not self._is_open:
+            return {"open": False, "readers": 0, "replaced": 0}
+        replaced = 0
+        for _ in range(self._readers.qsize()):
+            conn = self._readers.get_nowait()
+            try:
+                await conn.execute_fetchall("SELECT 1")
+            except Exception:
+                conn = await self._replace_reader(conn)
+                replaced += 1
+            finally:
+                self._readers.put_nowait(conn)
+        async with self.writer() as conn:
+            try:
+                await conn.execute_fetchall("SELECT 1")
+            except Exception:
+                await self._replace_writer()
+                replaced += 1
+        return {"open": True, "readers": len(self._all_readers), "replaced": replaced}
+
+class UnitOfWork:
+    """Группа записей на пишущем соединении, которая фиксируется одним COMMIT"""
+    def __init__(self, conn):
+        self.conn = conn
+        self.touched: set[str] = set()
+
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        cursor = await self.conn.execute(query, params)
+        return cursor.lastrowid
+
+    async def executemany(self, query: str, rows: list[tuple]):
+        if rows:
+            await self.conn.executemany(query, rows)
+
+    def touch(self, *names: str):
+        """Версии кэшей names поднимаются в той же транзакции перед COMMIT"""
+        self.touched.update(names)
+
+# ========== ЗАГРУЗКА МЕДИА ИЗ TELEGRAM ==========
+class TelegramMediaDownloader:
+    """Параллельно скачивает фото из Telegram с ограничением на хост, повторами и потоковой записью на диск"""
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, client: httpx.AsyncClient, per_host: int = 4, retries: int = 3, backoff: float = 0.5):
+        self.client = client
+        self.per_host = max(1, per_host)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
+
+    def _limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None and response.status_code == 429:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff * (2 ** attempt)
+
+    async def _get_file_path(self, file_id: str) -> tuple[str, int]:
+        url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/getFile"
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._limit(url):
+                    response = await self.client.get(url, params={"file_id": file_id})
+            except httpx.TransportError as exc:
+                if attempt == self.retries:
+                    logger.warning(f"Telegram photo getFile failed: {type(exc).__name__}")
+                    return "", attempt + 1
+                await asyncio.sleep(self._retry_delay(attempt))
+                continue
+            if response.status_code in self.RETRY_STATUSES and attempt < self.retries:
+                await asyncio.sleep(self._retry_delay(attempt, response))
+                continue
+            if response.status_code != 200:
+                logger.warning("Telegram photo getFile failed without exposing token: %s", response.status_code)
+                return "", attempt + 1
+            payload = response.json()
+            if not payload.get("ok"):
+                logger.warning("Telegram photo getFile API error: %s", payload.get("description", "unknown error"))
+                return "", attempt + 1
+            return payload.get("result", {}).get("file_path", ""), attempt + 1
+        return "", self.retries + 1
+
+    async def _stream_to_file(self, file_path: str, target: Path) -> bool:
+        url = f"https://api.telegram.org/file/bot{settings.TELEGRAM_BOT_TOKEN}/{file_path}"
+        temp_target = target.with_name(f".{target.name}.part")
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._limit(url):
+                    async with self.client.stream("GET", url) as response:
+                        if response.status_code in self.RETRY_STATUSES and attempt < self.retries:
+                            delay = self._retry_delay(attempt, response)
+                        elif response.status_code != 200:
+                            logger.warning("Telegram photo download skipped: status=%s", response.status_code)
+                            return False
+                        elif int(response.headers.get("Content-Length") or 0) > MAX_IMAGE_BYTES:
+                            logger.warning("Telegram photo download skipped: file is larger than 8 MB")
+                            return False
+                        else:
+                            size = 0
+                            async with aiofiles.open(temp_target, "wb") as output:
+                                async for chunk in response.aiter_bytes(UPLOAD_CHUNK_SIZE):
+                                    size += len(chunk)
+                                    if size > MAX_IMAGE_BYTES:
+                                        raise ValueError("Telegram photo is larger than 8 MB")
+                                    await output.write(chunk)
+                            await aiofiles.os.replace(temp_target, target)
+                            static_assets.add(str(target))
+                            return True
+            except httpx.TransportError as exc:
+                if attempt == self.retries:
+                    logger.warning(f"Telegram photo download failed: {type(exc).__name__}")
+                    break
+                delay = self._retry_delay(attempt)
+            except ValueError as exc:
+                logger.warning(f"Telegram photo download skipped: {exc}")
+                break
+            finally:
+                if temp_target.exists():
+                    await aiofiles.os.remove(temp_target)
+            await asyncio.sleep(delay)
+        return False
+
+    async def download(self, file_id: str, message_key: str, sort_order: int) -> dict:
+        started = time.perf_counter()
+        result = {"file_id": file_id, "message_key": message_key, "sort_order": sort_order, "path": None}
+        file_path, attempts = await self._get_file_path(file_id)
+        if file_path:
+            suffix = Path(file_path).suffix.lower() or ".jpg"
+            if suffix not in ALLOWED_IMAGE_EXTENSIONS:
+                suffix = ".jpg"
+            target_dir = Path("static/blog_photos")
+            target_dir.mkdir(parents=True, exist_ok=True)
+            safe_key = re.sub(r"[^a-zA-Z0-9_-]+", "-", message_key).strip("-") or uuid4().hex[:8]
+            target = target_dir / f"telegram_{safe_key}_{sort_order}_{uuid4().hex[:8]}{suffix}"
+            if await self._stream_to_file(file_path, target):
+                result["path"] = "/" + str(target).replace("\\", "/")
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        result["getfile_attempts"] = attempts
+        logger.info(
+            f"Telegram photo {message_key}#{sort_order}: "
+            f"{'ok' if result['path'] else 'failed'} за {result['seconds']} с"
+        )
+        return result
+
+    async def download_many(self, items: list[tuple[str, str, int]]) -> list[dict]:
+        """items: (file_id, message_key, sort_order); результаты возвращаются в том же порядке"""
+        return await asyncio.gather(*(self.download(*item) for item in items))
+
+# ========== СХЕМА И НАЧАЛЬНЫЕ ДАННЫЕ ==========
+# Номер последней миграции; хранится в PRAGMA user_version
+SCHEMA_VERSION = 4
+
+SEED_SETTINGS = {
+    "master_name": "Тина Борке",
+    "master_name_genitive": "Тины Борке",
+    "master_name_prepositional": "Тине Борке",
+    "city": "Санкт-Петербург",
+    "phone": "+7 999 000-00-00",
+    "contact_email": "",
+    "telegram_contact_url": "https://t.me/SPB_Tina_Borke",
+    "telegram_channel_url": "https://t.me/TinaBorkeMakeUp",
+    "social_avito_url": "https://www.avito.ru/sankt-peterburg/predlozheniya_uslug/vizazhistmakiyazhpricheskiukladkisvadebnyy_stilist_7398583171",
+    "social_vk_url": "",
+    "social_tiktok_url": "",
+    "map_url": "",
+    "working_hours": "Ежедневно по предварительной записи",
+    "area_served": "Санкт-Петербург и районы выезда",
+    "about_text": "Я профессиональный визажист-гример. Работаю легко и с любовью, использую качественные продукты и подбираю образ под вашу внешность и настроение.",
+    "promo_text": "ОСЕННЯЯ АКЦИЯ - Скидка 10% на все услуги",
+    "homepage_intro_line_1": "Создаю уникальные образы с душой",
+    "homepage_intro_line_2": "Профессиональный визажист-гример в Санкт-Петербурге",
+    "home_title": "Визажист в Санкт-Петербурге Тина Борке",
+    "home_description": "Профессиональный визажист-гример в Санкт-Петербурге: лифтинг макияж, свадебные образы, грим, укладки и обучение.",
+    "blog_title": "Советы по макияжу и образы — визажист Тина Борке",
+    "blog_description": "Полезные советы по макияжу, свадебным образам, фотосессиям и подготовке к важным событиям от визажиста Тины Борке в Санкт-Петербурге.",
+    "telegram_import_last_run": "",
+    "telegram_import_last_count": "0",
+    "telegram_import_last_error": "",
+    "telegram_import_offset": "0",
+}
+
+SEED_SERVICE_INCLUDES = "\n".join([
+    "Предварительное обсуждение образа и пожеланий.",
+    "Подбор оттенков под внешность, событие и одежду.",
+    "Аккуратная работа профессиональными продуктами.",
+    "Финальные рекомендации по сохранению образа.",
+])
+SEED_SUITABLE_FOR = "Услуга подойдет, если нужен продуманный образ без перегруза: для праздника, съемки, важной встречи или личного события."
+
+SEED_SERVICES = (
+    ("Дневной макияж", "dnevnoy-makiyazh", "Легкий аккуратный макияж на каждый день.", "от 2 500 ₽", "1 час", 10, 0, "main"),
+    ("Вечерний макияж", "vecherniy-makiyazh", "Выразительный образ для события, съемки или вечера.", "от 3 000 ₽", "1 час 30 минут", 20, 1, "main"),
+    ("ЛИФТИНГ макияж", "lifting-makiyazh", "Свежий деликатный макияж с акцентом на лифтинг-эффект.", "от 3 500 ₽", "1 час 30 минут", 30, 1, "main"),
+    ("Свадебный образ", "svadebnyy-obraz", "Полный образ невесты с учетом платья, прически и стилистики свадьбы.", "от 7 000 ₽", "2 часа 30 минут", 40, 1, "main"),
+    ("Макияж для фотосессии", "makiyazh-dlya-fotosessii", "Стойкий макияж для камеры, света и выбранной концепции.", "от 5 500 ₽", "2 часа", 50, 0, "additional"),
+    ("Обучение макияжу", "obuchenie-makiyazhu", "Индивидуальный урок для повседневного или вечернего макияжа.", "Договорная", "2 часа", 60, 0, "additional"),
+)
+
+SEED_PORTFOLIO_CATEGORIES = (
+    ("Свадебный макияж", "svadebnyy-makiyazh", "Нежные и стойкие свадебные образы для утра невесты и фотосессии.", 10),
+    ("Выпускной", "vypusknoy", "Образы для выпускниц: свежий макияж, укладка и гармония с платьем.", 20),
+    ("День рождения", "den-rozhdeniya", "Яркие, праздничные и аккуратные образы для особого дня.", 30),
+    ("Вечерний макияж", "vecherniy-makiyazh", "Выразительные вечерние образы для событий, съемок и праздников.", 40),
+    ("Лифтинг макияж", "lifting-makiyazh", "Деликатные лифтинг-образы с акцентом на свежесть и ухоженность.", 50),
+)
+
+SEED_SERVICE_PORTFOLIO_LINKS = {
+    "lifting-makiyazh": "lifting-makiyazh",
+    "vecherniy-makiyazh": "vecherniy-makiyazh",
+    "svadebnyy-obraz": "svadebnyy-makiyazh",
+}
+
+SEED_REVIEWS = (
+    ("Клиент", "Очень аккуратная работа и приятная атмосфера. Образ продержался весь день."),
+    ("Невеста", "Спасибо за свадебный образ. Макияж выглядел нежно и красиво на фото."),
+)
+
+# Полнотекстовые индексы: (FTS-таблица, таблица-источник, заголовок, текст, колонки для переиндексации).
+# {row} подставляется пустым для представления и NEW./OLD. в триггерах
+SEARCH_INDEXES = (
+    ("search_posts", "blog_posts", "{row}title", "{row}text_markdown", "title, text_markdown"),
+    ("search_services", "services", "{row}title", "{row}description || ' ' || {row}detailed_description", "title, description, detailed_description"),
+    ("search_faq", "service_faq", "{row}question", "{row}answer", "question, answer"),
+)
+
+def seed_fingerprint() -> str:
+    """Отпечаток начальных данных: при их изменении seed_defaults выполнится заново на следующем старте"""
+    payload = json.dumps(
+        [SEED_SETTINGS, SEED_SERVICE_INCLUDES, SEED_SUITABLE_FOR, SEED_SERVICES, SEED_PORTFOLIO_CATEGORIES,
+         SEED_SERVICE_PORTFOLIO_LINKS, SEED_REVIEWS, BLOG_CATEGORIES],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def split_sql_script(script: str) -> list[str]:
+    """Делит SQL-скрипт на операторы с учетом тел триггеров.
+    executescript сам делает COMMIT, а миграции должны выполняться в одной транзакции"""
+    statements = []
+    buffer = ""
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ""
+    if buffer.strip():
+        statements.append(buffer.strip())
+    return statements
+
 # ========== РАБОТА С БАЗОЙ ДАННЫХ ==========
+@observe_db_methods
 class Database:
     """Класс для работы с базой данных SQLite"""
     def __init__(self, db_path: str = "tinaborke.db"):
         self.db_path = db_path
+        self.pool = SQLitePool(db_path, settings.DB_READ_POOL_SIZE, settings.DB_POOL_TIMEOUT)
+        self._settings_cache: Optional[dict] = None
+        self._settings_version: Optional[tuple] = None
+        self._cache_versions: Optional[dict] = None
+        self._image_variants: Optional[dict] = None
+        self._image_variants_version = None
+        self._cache_versions_checked_at = 0.0
         logger.info(f"Инициализирован Database с путем: {db_path}")
 
+    async def close(self):
+        await self.pool.close()
+
     async def init_db(self):
-        """Инициализация базы данных - создание таблицы если не существует"""
+        """Приводит схему к SCHEMA_VERSION и применяет начальные данные; на теплом старте только читает состояние"""
         logger.info("Начало инициализации базы данных")
+        seed_key = f"seed_defaults:{seed_fingerprint()}"
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS bookings (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        name TEXT NOT NULL,
-                        phone TEXT NOT NULL,
-                        service TEXT,
-                        date TEXT,
-                        message TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        status TEXT DEFAULT 'new'
+            async with self.pool.writer() as db:
+                version, seeded = await self._schema_state(db, seed_key)
+                if version >= SCHEMA_VERSION and seeded:
+                    logger.info(f"База данных актуальна: схема v{version}, {seed_key}")
+                    return
+                # BEGIN IMMEDIATE сериализует миграции между воркерами; состояние перечитывается уже под блокировкой
+                await db.execute("BEGIN IMMEDIATE")
+                version, seeded = await self._schema_state(db, seed_key)
+                if version > SCHEMA_VERSION:
+                    logger.warning(f"Схема базы v{version} новее кода (v{SCHEMA_VERSION}), миграции пропущены")
+                for step in self.schema_migrations()[version:]:
+                    version += 1
+                    await step(db)
+                    logger.info(f"Применена миграция схемы v{version}: {step.__name__}")
+                await db.execute(f"PRAGMA user_version = {version}")
+                if not seeded:
+                    await self.seed_defaults(db)
+                    await db.execute(
+                        "INSERT OR IGNORE INTO seed_state (key, applied_at) VALUES (?, ?)",
+                        (seed_key, get_moscow_time().strftime("%Y-%m-%d %H:%M:%S")),
                     )
-                """)
-                await db.executescript("""
-                    CREATE TABLE IF NOT EXISTS settings (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        key TEXT NOT NULL UNIQUE,
-                        value TEXT NOT NULL DEFAULT ''
-                    );
-                    CREATE TABLE IF NOT EXISTS services (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        title TEXT NOT NULL,
-                        slug TEXT NOT NULL UNIQUE,
-                        description TEXT NOT NULL DEFAULT '',
-                        service_includes TEXT NOT NULL DEFAULT '',
-                        suitable_for TEXT NOT NULL DEFAULT '',
-                        h1_title TEXT NOT NULL DEFAULT '',
-                        detailed_description TEXT NOT NULL DEFAULT '',
-                        preparation_text TEXT NOT NULL DEFAULT '',
-                        duration TEXT NOT NULL DEFAULT '',
-                        is_popular INTEGER NOT NULL DEFAULT 0,
-                        service_group TEXT NOT NULL DEFAULT 'main',
-                        price TEXT NOT NULL DEFAULT '',
-                        sort_order INTEGER NOT NULL DEFAULT 0,
-                        seo_title TEXT NOT NULL DEFAULT '',
-                        seo_description TEXT NOT NULL DEFAULT '',
-                        is_hit INTEGER NOT NULL DEFAULT 0,
-                        portfolio_category_id INTEGER,
-                        is_active INTEGER NOT NULL DEFAULT 1
-                    );
-                    CREATE TABLE IF NOT EXISTS deleted_seed_services (
-                        slug TEXT PRIMARY KEY,
-                        deleted_at TEXT NOT NULL
-                    );
-                    CREATE TABLE IF NOT EXISTS deleted_seed_blog_categories (
-                        slug TEXT PRIMARY KEY,
-                        deleted_at TEXT NOT NULL
-                    );
-                    CREATE TABLE IF NOT EXISTS deleted_seed_portfolio_categories (
-                        slug TEXT PRIMARY KEY,
-                        deleted_at TEXT NOT NULL
-                    );
-                    CREATE TABLE IF NOT EXISTS deleted_seed_reviews (
-                        review_key TEXT PRIMARY KEY,
-                        deleted_at TEXT NOT NULL
-                    );
-                    CREATE TABLE IF NOT EXISTS seed_state (
-                        key TEXT PRIMARY KEY,
-                        applied_at TEXT NOT NULL
-                    );
-                    CREATE TABLE IF NOT EXISTS gallery (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        image_path TEXT NOT NULL,
-                        alt_text TEXT NOT NULL DEFAULT '',
-                        sort_order INTEGER NOT NULL DEFAULT 0,
-                        is_active INTEGER NOT NULL DEFAULT 1
-                    );
-                    CREATE TABLE IF NOT EXISTS reviews (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        service_id INTEGER,
-                        client_name TEXT NOT NULL,
-                        text TEXT NOT NULL,
-                        created_at TEXT NOT NULL,
-                        is_active INTEGER NOT NULL DEFAULT 1,
-                        FOREIGN KEY(service_id) REFERENCES services(id)
-                    );
-                    CREATE TABLE IF NOT EXISTS blog_posts (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        telegram_message_id TEXT UNIQUE,
-                        title TEXT NOT NULL,
-                        slug TEXT NOT NULL UNIQUE,
-                        text_html TEXT NOT NULL DEFAULT '',
-                        text_markdown TEXT NOT NULL DEFAULT '',
-                        excerpt TEXT NOT NULL DEFAULT '',
-                        category TEXT NOT NULL DEFAULT 'Образы и заметки',
-                        first_image TEXT,
-                        cover_image TEXT,
-                        cover_alt TEXT NOT NULL DEFAULT '',
-                        created_at TEXT NOT NULL,
-                        is_visible INTEGER NOT NULL DEFAULT 1,
-                        is_deleted INTEGER NOT NULL DEFAULT 0,
-                        status TEXT NOT NULL DEFAULT 'draft',
-                        is_indexable INTEGER NOT NULL DEFAULT 0,
-                        seo_title TEXT NOT NULL DEFAULT '',
-                        seo_description TEXT NOT NULL DEFAULT ''
-                    );
-                    CREATE TABLE IF NOT EXISTS blog_categories (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        title TEXT NOT NULL UNIQUE,
-                        slug TEXT NOT NULL UNIQUE,
-                        sort_order INTEGER NOT NULL DEFAULT 0
-                    );
-                    CREATE TABLE IF NOT EXISTS blog_photos (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        post_id INTEGER NOT NULL,
-                        image_path TEXT NOT NULL,
-                        alt_text TEXT NOT NULL DEFAULT '',
-                        sort_order INTEGER NOT NULL DEFAULT 0,
-                        created_at TEXT NOT NULL DEFAULT '',
-                        FOREIGN KEY(post_id) REFERENCES blog_posts(id) ON DELETE CASCADE
-                    );
-                    CREATE TABLE IF NOT EXISTS portfolio_categories (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        title TEXT NOT NULL,
-                        slug TEXT NOT NULL UNIQUE,
-                        description TEXT NOT NULL DEFAULT '',
-                        sort_order INTEGER NOT NULL DEFAULT 0,
-                        is_active INTEGER NOT NULL DEFAULT 1,
-                        is_deleted INTEGER NOT NULL DEFAULT 0
-                    );
-                    CREATE TABLE IF NOT EXISTS portfolio_photos (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        category_id INTEGER,
-                        service_id INTEGER,
-                        image_path TEXT NOT NULL,
-                        alt_text TEXT NOT NULL DEFAULT '',
-                        sort_order INTEGER NOT NULL DEFAULT 0,
-                        is_active INTEGER NOT NULL DEFAULT 1,
-                        created_at TEXT NOT NULL,
-                        FOREIGN KEY(category_id) REFERENCES portfolio_categories(id),
-                        FOREIGN KEY(service_id) REFERENCES services(id)
-                    );
-                    CREATE TABLE IF NOT EXISTS service_faq (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        service_id INTEGER NOT NULL,
-                        question TEXT NOT NULL,
-                        answer TEXT NOT NULL,
-                        sort_order INTEGER NOT NULL DEFAULT 0,
-                        is_active INTEGER NOT NULL DEFAULT 1,
-                        FOREIGN KEY(service_id) REFERENCES services(id)
-                    );
-                    CREATE TABLE IF NOT EXISTS service_related_services (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        service_id INTEGER NOT NULL,
-                        related_service_id INTEGER NOT NULL,
-                        sort_order INTEGER NOT NULL DEFAULT 0,
-                        FOREIGN KEY(service_id) REFERENCES services(id),
-                        FOREIGN KEY(related_service_id) REFERENCES services(id)
-                    );
-                    CREATE TABLE IF NOT EXISTS service_related_posts (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        service_id INTEGER NOT NULL,
-                        post_id INTEGER NOT NULL,
-                        sort_order INTEGER NOT NULL DEFAULT 0,
-                        FOREIGN KEY(service_id) REFERENCES services(id),
-                        FOREIGN KEY(post_id) REFERENCES blog_posts(id)
-                    );
-                """)
-                await self.migrate_db(db)
-                await self.seed_defaults(db)
                 await db.commit()
-                logger.info("База данных успешно инициализирована")
+                logger.info(f"База данных успешно инициализирована: схема v{version}, {seed_key}")
         except Exception as e:
             logger.error(f"Ошибка инициализации базы данных: {e}")
             raise
 
-    async def migrate_db(self, db):
-        async def ensure_column(table: str, column: str, definition: str):
-            async with db.execute(f"PRAGMA table_info({table})") as cursor:
-                columns = [row[1] for row in await cursor.fetchall()]
-            if column not in columns:
-                await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
-
-        await ensure_column("services", "is_hit", "INTEGER NOT NULL DEFAULT 0")
-        await ensure_column("services", "portfolio_category_id", "INTEGER")
-        await ensure_column("services", "service_includes", "TEXT NOT NULL DEFAULT ''")
-        await ensure_column("services", "suitable_for", "TEXT NOT NULL DEFAULT ''")
-        await ensure_column("services", "h1_title", "TEXT NOT NULL DEFAULT ''")
-        await ensure_column("services", "detailed_description", "TEXT NOT NULL DEFAULT ''")
-        await ensure_column("services", "preparation_text", "TEXT NOT NULL DEFAULT ''")
-        await ensure_column("services", "duration", "TEXT NOT NULL DEFAULT ''")
-        await ensure_column("services", "is_popular", "INTEGER NOT NULL DEFAULT 0")
-        await ensure_column("services", "service_group", "TEXT NOT NULL DEFAULT 'main'")
-        await ensure_column("reviews", "service_id", "INTEGER")
-        await ensure_column("blog_photos", "alt_text", "TEXT NOT NULL DEFAULT ''")
-        await ensure_column("blog_photos", "created_at", "TEXT NOT NULL DEFAULT ''")
-        await ensure_column("blog_posts", "is_deleted", "INTEGER NOT NULL DEFAULT 0")
-        await ensure_column("blog_posts", "excerpt", "TEXT NOT NULL DEFAULT ''")
-        await ensure_column("blog_posts", "category", "TEXT NOT NULL DEFAULT 'Образы и заметки'")
-        await ensure_column("blog_posts", "cover_image", "TEXT")
-        await ensure_column("blog_posts", "cover_alt", "TEXT NOT NULL DEFAULT ''")
-        await ensure_column("blog_posts", "status", "TEXT NOT NULL DEFAULT 'draft'")
-        await ensure_column("blog_posts", "is_indexable", "INTEGER NOT NULL DEFAULT 0")
-        await ensure_column("portfolio_categories", "is_deleted", "INTEGER NOT NULL DEFAULT 0")
-        await db.executescript("""
-            CREATE TABLE IF NOT EXISTS service_faq (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                service_id INTEGER NOT NULL,
-                question TEXT NOT NULL,
-                answer TEXT NOT NULL,
-                sort_order INTEGER NOT NULL DEFAULT 0,
-                is_active INTEGER NOT NULL DEFAULT 1,
-                FOREIGN KEY(service_id) REFERENCES services(id)
-            );
-            CREATE TABLE IF NOT EXISTS service_related_services (
+    async def _schema_state(self, db, seed_key: str) -> tuple[int, bool]:
+        """Текущая версия схемы из PRAGMA user_version и признак того, что начальные данные этой версии уже записаны"""
+        async with db.execute("PRAGMA user_version") as cursor:
+            version = (await cursor.fetchone())[0]
+        if version < 1:
+            return version, False
+        async with db.execute("SELECT 1 FROM seed_state WHERE key = ?", (seed_key,)) as cursor:
+            return version, await cursor.fetchone() is not None
+
+    def schema_migrations(self) -> list:
+        """Шаги миграций по порядку: шаг с номером N переводит базу с user_version N - 1 на N.
+        Шаги идемпотентны, чтобы база, созданная до появления версий, проходила их без ошибок"""
+        return [
+            self._migrate_v1_base_schema,
+            self._migrate_v2_listing_indexes,
+            self._migrate_v3_blog_post_preview,
+            self._migrate_v4_search_index,
+        ]
+
+    async def _ensure_column(self, db, table: str, column: str, definition: str):
+        async with db.execute(f"PRAGMA table_info({table})") as cursor:
+            columns = [row[1] for row in await cursor.fetchall()]
+        if column not in columns:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    async def _migrate_v1_base_schema(self, db):
+        """Базовая схема; для старых баз без user_version добавляет недостающие колонки"""
+        for statement in split_sql_script("""
+            CREATE TABLE IF NOT EXISTS bookings (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                service_id INTEGER NOT NULL,
-                related_service_id INTEGER NOT NULL,
-                sort_order INTEGER NOT NULL DEFAULT 0,
-                FOREIGN KEY(service_id) REFERENCES services(id),
-                FOREIGN KEY(related_service_id) REFERENCES services(id)
+                name TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                service TEXT,
+                date TEXT,
+                message TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                status TEXT DEFAULT 'new'
             );
-            CREATE TABLE IF NOT EXISTS service_related_posts (
+            CREATE TABLE IF NOT EXISTS settings (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                service_id INTEGER NOT NULL,
-                post_id INTEGER NOT NULL,
-                sort_order INTEGER NOT NULL DEFAULT 0,
-                FOREIGN KEY(service_id) REFERENCES services(id),
-                FOREIGN KEY(post_id) REFERENCES blog_posts(id)
+                key TEXT NOT NULL UNIQUE,
+                value TEXT NOT NULL DEFAULT ''
             );
-            CREATE TABLE IF NOT EXISTS blog_categories (
+            CREATE TABLE IF NOT EXISTS services (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL UNIQUE,
+                title TEXT NOT NULL,
                 slug TEXT NOT NULL UNIQUE,
-                sort_order INTEGER NOT NULL DEFAULT 0
+                description TEXT NOT NULL DEFAULT '',
+                service_includes TEXT NOT NULL DEFAULT '',
+                suitable_for TEXT NOT NULL DEFAULT '',
+                h1_title TEXT NOT NULL DEFAULT '',
+                detailed_description TEXT NOT NULL DEFAULT '',
+                preparation_text TEXT NOT NULL DEFAULT '',
+                duration TEXT NOT NULL DEFAULT '',
+                is_popular INTEGER NOT NULL DEFAULT 0,
+                service_group TEXT NOT NULL DEFAULT 'main',
+                price TEXT NOT NULL DEFAULT '',
+                sort_order INTEGER NOT NULL DEFAULT 0,
+                seo_title TEXT NOT NULL DEFAULT '',
+                seo_description TEXT NOT NULL DEFAULT '',
+                is_hit INTEGER NOT NULL DEFAULT 0,
+                portfolio_category_id INTEGER,
+                is_active INTEGER NOT NULL DEFAULT 1
             );
             CREATE TABLE IF NOT EXISTS deleted_seed_services (
                 slug TEXT PRIMARY KEY,
@@ -597,56 +1265,246 @@ class Database:
                 key TEXT PRIMARY KEY,
                 applied_at TEXT NOT NULL
             );
+            CREATE TABLE IF NOT EXISTS cache_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS image_variants (
+                image_path TEXT NOT NULL,
+                width INTEGER NOT NULL,
+                format TEXT NOT NULL,
+                variant_path TEXT NOT NULL,
+                PRIMARY KEY (image_path, width, format)
+            );
+            CREATE TABLE IF NOT EXISTS worker_leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                booking_id INTEGER,
+                chat_id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT NOT NULL DEFAULT '',
+                created_at TEXT NOT NULL DEFAULT '',
+                sent_at TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS idx_notification_outbox_due ON notification_outbox(status, next_attempt_at);
+            CREATE TABLE IF NOT EXISTS gallery (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                image_path TEXT NOT NULL,
+                alt_text TEXT NOT NULL DEFAULT '',
+                sort_order INTEGER NOT NULL DEFAULT 0,
+                is_active INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE TABLE IF NOT EXISTS reviews (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                service_id INTEGER,
+                client_name TEXT NOT NULL,
+                text TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                is_active INTEGER NOT NULL DEFAULT 1,
+                FOREIGN KEY(service_id) REFERENCES services(id)
+            );
+            CREATE TABLE IF NOT EXISTS blog_posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                telegram_message_id TEXT UNIQUE,
+                title TEXT NOT NULL,
+                slug TEXT NOT NULL UNIQUE,
+                text_html TEXT NOT NULL DEFAULT '',
+                text_markdown TEXT NOT NULL DEFAULT '',
+                excerpt TEXT NOT NULL DEFAULT '',
+                category TEXT NOT NULL DEFAULT 'Образы и заметки',
+                first_image TEXT,
+                cover_image TEXT,
+                cover_alt TEXT NOT NULL DEFAULT '',
+                created_at TEXT NOT NULL,
+                is_visible INTEGER NOT NULL DEFAULT 1,
+                is_deleted INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'draft',
+                is_indexable INTEGER NOT NULL DEFAULT 0,
+                seo_title TEXT NOT NULL DEFAULT '',
+                seo_description TEXT NOT NULL DEFAULT ''
+            );
+            CREATE TABLE IF NOT EXISTS blog_categories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL UNIQUE,
+                slug TEXT NOT NULL UNIQUE,
+                sort_order INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS blog_photos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                post_id INTEGER NOT NULL,
+                image_path TEXT NOT NULL,
+                alt_text TEXT NOT NULL DEFAULT '',
+                sort_order INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL DEFAULT '',
+                telegram_message_id TEXT,
+                FOREIGN KEY(post_id) REFERENCES blog_posts(id) ON DELETE CASCADE
+            );
+            CREATE TABLE IF NOT EXISTS portfolio_categories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                slug TEXT NOT NULL UNIQUE,
+                description TEXT NOT NULL DEFAULT '',
+                sort_order INTEGER NOT NULL DEFAULT 0,
+                is_active INTEGER NOT NULL DEFAULT 1,
+                is_deleted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS portfolio_photos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category_id INTEGER,
+                service_id INTEGER,
+                image_path TEXT NOT NULL,
+                alt_text TEXT NOT NULL DEFAULT '',
+                sort_order INTEGER NOT NULL DEFAULT 0,
+                is_active INTEGER NOT NULL DEFAULT 1,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY(category_id) REFERENCES portfolio_categories(id),
+                FOREIGN KEY(service_id) REFERENCES services(id)
+            );
+            CREATE TABLE IF NOT EXISTS service_faq (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                service_id INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                sort_order INTEGER NOT NULL DEFAULT 0,
+                is_active INTEGER NOT NULL DEFAULT 1,
+                FOREIGN KEY(service_id) REFERENCES services(id)
+            );
+            CREATE TABLE IF NOT EXISTS service_related_services (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                service_id INTEGER NOT NULL,
+                related_service_id INTEGER NOT NULL,
+                sort_order INTEGER NOT NULL DEFAULT 0,
+                FOREIGN KEY(service_id) REFERENCES services(id),
+                FOREIGN KEY(related_service_id) REFERENCES services(id)
+            );
+            CREATE TABLE IF NOT EXISTS service_related_posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                service_id INTEGER NOT NULL,
+                post_id INTEGER NOT NULL,
+                sort_order INTEGER NOT NULL DEFAULT 0,
+                FOREIGN KEY(service_id) REFERENCES services(id),
+                FOREIGN KEY(post_id) REFERENCES blog_posts(id)
+            );
+        """):
+            await db.execute(statement)
+        await self._ensure_column(db, "services", "is_hit", "INTEGER NOT NULL DEFAULT 0")
+        await self._ensure_column(db, "services", "portfolio_category_id", "INTEGER")
+        await self._ensure_column(db, "services", "service_includes", "TEXT NOT NULL DEFAULT ''")
+        await self._ensure_column(db, "services", "suitable_for", "TEXT NOT NULL DEFAULT ''")
+        await self._ensure_column(db, "services", "h1_title", "TEXT NOT NULL DEFAULT ''")
+        await self._ensure_column(db, "services", "detailed_description", "TEXT NOT NULL DEFAULT ''")
+        await self._ensure_column(db, "services", "preparation_text", "TEXT NOT NULL DEFAULT ''")
+        await self._ensure_column(db, "services", "duration", "TEXT NOT NULL DEFAULT ''")
+        await self._ensure_column(db, "services", "is_popular", "INTEGER NOT NULL DEFAULT 0")
+        await self._ensure_column(db, "services", "service_group", "TEXT NOT NULL DEFAULT 'main'")
+        await self._ensure_column(db, "reviews", "service_id", "INTEGER")
+        await self._ensure_column(db, "blog_photos", "alt_text", "TEXT NOT NULL DEFAULT ''")
+        await self._ensure_column(db, "blog_photos", "created_at", "TEXT NOT NULL DEFAULT ''")
+        await self._ensure_column(db, "blog_photos", "telegram_message_id", "TEXT")
+        await self._ensure_column(db, "blog_posts", "is_deleted", "INTEGER NOT NULL DEFAULT 0")
+        await self._ensure_column(db, "blog_posts", "excerpt", "TEXT NOT NULL DEFAULT ''")
+        await self._ensure_column(db, "blog_posts", "category", "TEXT NOT NULL DEFAULT 'Образы и заметки'")
+        await self._ensure_column(db, "blog_posts", "cover_image", "TEXT")
+        await self._ensure_column(db, "blog_posts", "cover_alt", "TEXT NOT NULL DEFAULT ''")
+        await self._ensure_column(db, "blog_posts", "status", "TEXT NOT NULL DEFAULT 'draft'")
+        await self._ensure_column(db, "blog_posts", "is_indexable", "INTEGER NOT NULL DEFAULT 0")
+        await self._ensure_column(db, "portfolio_categories", "is_deleted", "INTEGER NOT NULL DEFAULT 0")
+        # Одно фото сообщения Telegram сохраняется один раз, даже если пачка getUpdates пришла повторно
+        await db.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_blog_photos_telegram_message ON blog_photos(telegram_message_id)
         """)
 
+    async def _migrate_v2_listing_indexes(self, db):
+        """Индексы под выборки публичных страниц; проверяются скриптом check_query_plans.py"""
+        for statement in split_sql_script("""
+            CREATE INDEX IF NOT EXISTS idx_portfolio_photos_category ON portfolio_photos(category_id, is_active, sort_order);
+            CREATE INDEX IF NOT EXISTS idx_portfolio_photos_service ON portfolio_photos(service_id, is_active, sort_order);
+            CREATE INDEX IF NOT EXISTS idx_portfolio_photos_active ON portfolio_photos(is_active, sort_order, id DESC);
+            CREATE INDEX IF NOT EXISTS idx_blog_photos_post ON blog_photos(post_id, sort_order);
+            CREATE INDEX IF NOT EXISTS idx_blog_posts_listing ON blog_posts(status, is_visible, is_deleted, created_at);
+            CREATE INDEX IF NOT EXISTS idx_reviews_service ON reviews(service_id, is_active, created_at);
+            CREATE INDEX IF NOT EXISTS idx_service_faq_service ON service_faq(service_id, sort_order);
+            CREATE INDEX IF NOT EXISTS idx_service_related_services_service ON service_related_services(service_id, sort_order);
+            CREATE INDEX IF NOT EXISTS idx_service_related_posts_service ON service_related_posts(service_id, sort_order);
+            CREATE INDEX IF NOT EXISTS idx_service_related_posts_post ON service_related_posts(post_id);
+        """):
+            await db.execute(statement)
+
+    async def _migrate_v3_blog_post_preview(self, db):
+        """preview_image и photo_count хранятся в blog_posts и поддерживаются триггерами,
+        чтобы списки постов не выполняли подзапросы к blog_photos для каждой строки"""
+        await self._ensure_column(db, "blog_posts", "preview_image", "TEXT")
+        await self._ensure_column(db, "blog_posts", "photo_count", "INTEGER NOT NULL DEFAULT 0")
+        preview = """
+            COALESCE(cover_image, first_image, (
+                SELECT image_path FROM blog_photos
+                WHERE blog_photos.post_id = blog_posts.id
+                ORDER BY sort_order, id
+                LIMIT 1
+            ))
+        """
+        photo_count = "(SELECT COUNT(*) FROM blog_photos WHERE blog_photos.post_id = blog_posts.id)"
+        for statement in split_sql_script(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_blog_photos_insert AFTER INSERT ON blog_photos BEGIN
+                UPDATE blog_posts SET photo_count = photo_count + 1, preview_image = {preview} WHERE id = NEW.post_id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_blog_photos_delete AFTER DELETE ON blog_photos BEGIN
+                UPDATE blog_posts SET photo_count = photo_count - 1, preview_image = {preview} WHERE id = OLD.post_id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_blog_photos_update AFTER UPDATE OF post_id, image_path, sort_order ON blog_photos BEGIN
+                UPDATE blog_posts SET photo_count = {photo_count}, preview_image = {preview} WHERE id IN (OLD.post_id, NEW.post_id);
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_blog_posts_insert_preview AFTER INSERT ON blog_posts BEGIN
+                UPDATE blog_posts SET preview_image = {preview} WHERE id = NEW.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_blog_posts_update_preview AFTER UPDATE OF cover_image, first_image ON blog_posts BEGIN
+                UPDATE blog_posts SET preview_image = {preview} WHERE id = NEW.id;
+            END;
+            UPDATE blog_posts SET photo_count = {photo_count}, preview_image = {preview};
+        """):
+            await db.execute(statement)
+
+    async def _migrate_v4_search_index(self, db):
+        """FTS5-индексы для /search. Индекс строится из представлений search_*_source, где ё заменена на е:
+        unicode61 считает их разными буквами. Триггеры пишут в индекс те же выражения, поэтому
+        команда 'delete' получает ровно тот текст, который был проиндексирован"""
+        def fold(expression: str) -> str:
+            return f"replace(replace({expression}, 'ё', 'е'), 'Ё', 'Е')"
+
+        for fts, table, title, body, columns in SEARCH_INDEXES:
+            source = {row: (fold(title.format(row=row)), fold(body.format(row=row))) for row in ("", "NEW.", "OLD.")}
+            for statement in split_sql_script(f"""
+                CREATE VIEW IF NOT EXISTS {fts}_source AS
+                    SELECT id, {source[""][0]} AS title, {source[""][1]} AS body FROM {table};
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    title, body, content='{fts}_source', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+                );
+                CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {fts} (rowid, title, body) VALUES (NEW.id, {source["NEW."][0]}, {source["NEW."][1]});
+                END;
+                CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {fts} ({fts}, rowid, title, body) VALUES ('delete', OLD.id, {source["OLD."][0]}, {source["OLD."][1]});
+                END;
+                CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {columns} ON {table} BEGIN
+                    INSERT INTO {fts} ({fts}, rowid, title, body) VALUES ('delete', OLD.id, {source["OLD."][0]}, {source["OLD."][1]});
+                    INSERT INTO {fts} (rowid, title, body) VALUES (NEW.id, {source["NEW."][0]}, {source["NEW."][1]});
+                END;
+                INSERT INTO {fts} ({fts}) VALUES ('rebuild');
+            """):
+                await db.execute(statement)
+
     async def seed_defaults(self, db):
-        default_settings = {
-            "master_name": "Тина Борке",
-            "master_name_genitive": "Тины Борке",
-            "master_name_prepositional": "Тине Борке",
-            "city": "Санкт-Петербург",
-            "phone": "+7 999 000-00-00",
-            "contact_email": "",
-            "telegram_contact_url": "https://t.me/SPB_Tina_Borke",
-            "telegram_channel_url": "https://t.me/TinaBorkeMakeUp",
-            "social_avito_url": "https://www.avito.ru/sankt-peterburg/predlozheniya_uslug/vizazhistmakiyazhpricheskiukladkisvadebnyy_stilist_7398583171",
-            "social_vk_url": "",
-            "social_tiktok_url": "",
-            "map_url": "",
-            "working_hours": "Ежедневно по предварительной записи",
-            "area_served": "Санкт-Петербург и районы выезда",
-            "about_text": "Я профессиональный визажист-гример. Работаю легко и с любовью, использую качественные продукты и подбираю образ под вашу внешность и настроение.",
-            "promo_text": "ОСЕННЯЯ АКЦИЯ - Скидка 10% на все услуги",
-            "homepage_intro_line_1": "Создаю уникальные образы с душой",
-            "homepage_intro_line_2": "Профессиональный визажист-гример в Санкт-Петербурге",
-            "home_title": "Визажист в Санкт-Петербурге Тина Борке",
-            "home_description": "Профессиональный визажист-гример в Санкт-Петербурге: лифтинг макияж, свадебные образы, грим, укладки и обучение.",
-            "blog_title": "Советы по макияжу и образы — визажист Тина Борке",
-            "blog_description": "Полезные советы по макияжу, свадебным образам, фотосессиям и подготовке к важным событиям от визажиста Тины Борке в Санкт-Петербурге.",
-            "telegram_import_last_run": "",
-            "telegram_import_last_count": "0",
-            "telegram_import_last_error": "",
-        }
-        for key, value in default_settings.items():
+        for key, value in SEED_SETTINGS.items():
             await db.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", (key, value))
 
-        default_service_includes = "\n".join([
-            "Предварительное обсуждение образа и пожеланий.",
-            "Подбор оттенков под внешность, событие и одежду.",
-            "Аккуратная работа профессиональными продуктами.",
-            "Финальные рекомендации по сохранению образа.",
-        ])
-        default_suitable_for = "Услуга подойдет, если нужен продуманный образ без перегруза: для праздника, съемки, важной встречи или личного события."
-
-        default_services = [
-            ("Дневной макияж", "dnevnoy-makiyazh", "Легкий аккуратный макияж на каждый день.", "от 2 500 ₽", "1 час", 10, 0, "main"),
-            ("Вечерний макияж", "vecherniy-makiyazh", "Выразительный образ для события, съемки или вечера.", "от 3 000 ₽", "1 час 30 минут", 20, 1, "main"),
-            ("ЛИФТИНГ макияж", "lifting-makiyazh", "Свежий деликатный макияж с акцентом на лифтинг-эффект.", "от 3 500 ₽", "1 час 30 минут", 30, 1, "main"),
-            ("Свадебный образ", "svadebnyy-obraz", "Полный образ невесты с учетом платья, прически и стилистики свадьбы.", "от 7 000 ₽", "2 часа 30 минут", 40, 1, "main"),
-            ("Макияж для фотосессии", "makiyazh-dlya-fotosessii", "Стойкий макияж для камеры, света и выбранной концепции.", "от 5 500 ₽", "2 часа", 50, 0, "additional"),
-            ("Обучение макияжу", "obuchenie-makiyazhu", "Индивидуальный урок для повседневного или вечернего макияжа.", "Договорная", "2 часа", 60, 0, "additional"),
-        ]
-        for title, slug, description, price, duration, sort_order, is_popular, service_group in default_services:
+        for title, slug, description, price, duration, sort_order, is_popular, service_group in SEED_SERVICES:
             async with db.execute("SELECT 1 FROM deleted_seed_services WHERE slug = ?", (slug,)) as cursor:
                 if await cursor.fetchone():
                     continue
@@ -663,8 +1521,8 @@ class Database:
             await db.execute("UPDATE services SET service_group = 'main' WHERE service_group = ''")
             await db.execute("UPDATE services SET is_popular = 1 WHERE slug IN ('vecherniy-makiyazh', 'lifting-makiyazh', 'svadebnyy-obraz') AND is_popular = 0")
             await db.execute("UPDATE services SET service_group = 'additional' WHERE slug IN ('makiyazh-dlya-fotosessii', 'obuchenie-makiyazhu')")
-            await db.execute("UPDATE services SET service_includes = ? WHERE service_includes = ''", (default_service_includes,))
-            await db.execute("UPDATE services SET suitable_for = ? WHERE suitable_for = ''", (default_suitable_for,))
+            await db.execute("UPDATE services SET service_includes = ? WHERE service_includes = ''", (SEED_SERVICE_INCLUDES,))
+            await db.execute("UPDATE services SET suitable_for = ? WHERE suitable_for = ''", (SEED_SUITABLE_FOR,))
             await db.execute("UPDATE blog_posts SET category = ? WHERE category IS NULL OR category = ''", (BLOG_DEFAULT_CATEGORY,))
             await db.execute("UPDATE blog_posts SET status = 'published' WHERE status = 'draft' AND is_visible = 1 AND is_deleted = 0")
             await db.execute("UPDATE blog_posts SET excerpt = seo_description WHERE excerpt = '' AND seo_description != ''")
@@ -693,14 +1551,7 @@ class Database:
                 VALUES (?, ?, 100)
             """, (title, slugify(title)))
 
-        default_categories = [
-            ("Свадебный макияж", "svadebnyy-makiyazh", "Нежные и стойкие свадебные образы для утра невесты и фотосессии.", 10),
-            ("Выпускной", "vypusknoy", "Образы для выпускниц: свежий макияж, укладка и гармония с платьем.", 20),
-            ("День рождения", "den-rozhdeniya", "Яркие, праздничные и аккуратные образы для особого дня.", 30),
-            ("Вечерний макияж", "vecherniy-makiyazh", "Выразительные вечерние образы для событий, съемок и праздников.", 40),
-            ("Лифтинг макияж", "lifting-makiyazh", "Деликатные лифтинг-образы с акцентом на свежесть и ухоженность.", 50),
-        ]
-        for title, slug, description, sort_order in default_categories:
+        for title, slug, description, sort_order in SEED_PORTFOLIO_CATEGORIES:
             async with db.execute("SELECT 1 FROM deleted_seed_portfolio_categories WHERE slug = ?", (slug,)) as cursor:
                 if await cursor.fetchone():
                     continue
@@ -709,23 +1560,14 @@ class Database:
                 VALUES (?, ?, ?, ?, 1)
             """, (title, slug, description, sort_order))
 
-        category_links = {
-            "lifting-makiyazh": "lifting-makiyazh",
-            "vecherniy-makiyazh": "vecherniy-makiyazh",
-            "svadebnyy-obraz": "svadebnyy-makiyazh",
-        }
-        for service_slug, category_slug in category_links.items():
+        for service_slug, category_slug in SEED_SERVICE_PORTFOLIO_LINKS.items():
             await db.execute("""
                 UPDATE services
                 SET portfolio_category_id = (SELECT id FROM portfolio_categories WHERE slug = ?)
                 WHERE slug = ? AND portfolio_category_id IS NULL
             """, (category_slug, service_slug))
 
-        default_reviews = [
-            ("Клиент", "Очень аккуратная работа и приятная атмосфера. Образ продержался весь день."),
-            ("Невеста", "Спасибо за свадебный образ. Макияж выглядел нежно и красиво на фото."),
-        ]
-        for client_name, text in default_reviews:
+        for client_name, text in SEED_REVIEWS:
             review_key = f"{client_name}|{text}"
             async with db.execute("SELECT 1 FROM deleted_seed_reviews WHERE review_key = ?", (review_key,)) as cursor:
                 if await cursor.fetchone():
@@ -736,78 +1578,199 @@ class Database:
                 WHERE NOT EXISTS (SELECT 1 FROM reviews WHERE client_name = ? AND text = ?)
             """, (client_name, text, get_moscow_time().strftime("%Y-%m-%d"), client_name, text))
 
-    async def create_booking(self, booking: BookingCreate) -> int:
-        """Создание новой заявки в базе данных"""
-        logger.info(f"Создание заявки в БД: {booking.name}, {booking.phone}")
-        try:
-            # Получаем московское время
-            moscow_time = get_moscow_time().strftime('%Y-%m-%d %H:%M:%S')
-
-            async with aiosqlite.connect(self.db_path) as db:
-                cursor = await db.execute("""
-                    INSERT INTO bookings (name, phone, service, date, message, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (booking.name, booking.phone, booking.service, booking.date, booking.message, moscow_time))
-                await db.commit()
-                booking_id = cursor.lastrowid
-                logger.info(f"Заявка успешно создана в БД с ID: {booking_id}")
-                return booking_id
-        except Exception as e:
-            logger.error(f"Ошибка создания заявки в БД: {e}")
-            raise
+    async def create_booking(self, booking: BookingCreate, notify_chat_ids: list[str] = ()) -> dict:
+        """Создание новой заявки вместе с уведомлениями в outbox; возвращает сохранённую строку"""
+        # Получаем московское время
+        moscow_time = get_moscow_time().strftime('%Y-%m-%d %H:%M:%S')
+        async with self.pool.writer() as db:
+            async with db.execute("""
+                INSERT INTO bookings (name, phone, service, date, message, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                RETURNING *
+            """, (booking.name, booking.phone, booking.service, booking.date, booking.message, moscow_time)) as cursor:
+                created = dict(await cursor.fetchone())
+            # Уведомления пишутся в той же транзакции: заявка не сохранится без них и наоборот
+            if notify_chat_ids:
+                text = format_booking_message(created)
+                await db.executemany("""
+                    INSERT INTO notification_outbox (booking_id, chat_id, text, created_at)
+                    VALUES (?, ?, ?, ?)
+                """, [(created["id"], chat_id, text, moscow_time) for chat_id in notify_chat_ids])
+            await db.commit()
+        return created
+
+    async def claim_outbox_batch(self, limit: int, lease: float) -> list[dict]:
+        """Забирает готовые к отправке уведомления и откладывает их на lease секунд, чтобы другой воркер их не взял"""
+        now = time.time()
+        async with self.pool.writer() as db:
+            async with db.execute("""
+                UPDATE notification_outbox
+                SET attempts = attempts + 1, next_attempt_at = ?
+                WHERE id IN (
+                    SELECT id FROM notification_outbox
+                    WHERE status = 'pending' AND next_attempt_at <= ?
+                    ORDER BY id
+                    LIMIT ?
+                )
+                RETURNING id, booking_id, chat_id, text, attempts
+            """, (now + lease, now, limit)) as cursor:
+                rows = [dict(row) for row in await cursor.fetchall()]
+            await db.commit()
+        return sorted(rows, key=lambda row: row["id"])
+
+    async def finish_outbox_batch(self, sent_ids: list[int], failures: list[tuple[int, float, str, bool]]):
+        """Отмечает отправленные уведомления; неудачные переносит на next_attempt_at или в dead-letter"""
+        sent_at = get_moscow_time().strftime('%Y-%m-%d %H:%M:%S')
+        async with self.pool.writer() as db:
+            if sent_ids:
+                await db.executemany("""
+                    UPDATE notification_outbox SET status = 'sent', last_error = '', sent_at = ? WHERE id = ?
+                """, [(sent_at, outbox_id) for outbox_id in sent_ids])
+            if failures:
+                await db.executemany("""
+                    UPDATE notification_outbox
+                    SET status = CASE WHEN ? THEN 'dead' ELSE 'pending' END, next_attempt_at = ?, last_error = ?
+                    WHERE id = ?
+                """, [(int(dead), next_attempt_at, error[:500], outbox_id) for outbox_id, next_attempt_at, error, dead in failures])
+            await db.commit()
 
-    async def get_booking(self, booking_id: int) -> Optional[dict]:
-        """Получение заявки по ID из базы данных"""
-        logger.info(f"Получение заявки из БД с ID: {booking_id}")
-        try:
-            async with aiosqlite.connect(self.db_path) as db:
-                async with db.execute("""
-                    SELECT * FROM bookings WHERE id = ?
-                """, (booking_id,)) as cursor:
-                    row = await cursor.fetchone()
-                    if row:
-                        columns = [column[0] for column in cursor.description]
-                        booking_data = dict(zip(columns, row))
-                        logger.info(f"Заявка найдена: {booking_data}")
-                        return booking_data
-                    logger.warning(f"Заявка с ID {booking_id} не найдена")
-                    return None
-        except Exception as e:
-            logger.error(f"Ошибка получения заявки из БД: {e}")
-            raise
+    async def get_outbox_stats(self) -> dict:
+        rows = await self.fetch_all("SELECT status, COUNT(*) AS count FROM notification_outbox GROUP BY status")
+        return {row["status"]: row["count"] for row in rows}
+
+    async def fetch_keyset_page(
+        self,
+        query: str,
+        params: tuple,
+        keys: tuple,
+        descending: bool,
+        limit: int,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+    ) -> dict:
+        """Страница выборки по ключу сортировки вместо OFFSET.
+
+        query — SELECT с WHERE, но без ORDER BY и LIMIT; keys — две пары (выражение SQL, поле строки).
+        after ведет на следующую страницу, before — на предыдущую.
+        """
+        (first_column, first_key), (second_column, second_key) = keys
+        cursor = decode_cursor(before or after)
+        backward = bool(before) and cursor is not None
+        scan_descending = descending != backward
+        order = "DESC" if scan_descending else "ASC"
+        params = tuple(params)
+        if cursor is not None:
+            query += f" AND ({first_column}, {second_column}) {'<' if scan_descending else '>'} (?, ?)"
+            params += tuple(cursor)
+        query += f" ORDER BY {first_column} {order}, {second_column} {order} LIMIT ?"
+        rows = await self.fetch_all(query, params + (limit + 1,))
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backward:
+            rows.reverse()
+        has_next = has_more if not backward else True
+        has_prev = has_more if backward else cursor is not None
+        return {
+            "items": rows,
+            "next_cursor": encode_cursor(rows[-1][first_key], rows[-1][second_key]) if rows and has_next else "",
+            "prev_cursor": encode_cursor(rows[0][first_key], rows[0][second_key]) if rows and has_prev else "",
+        }
 
     async def fetch_all(self, query: str, params: tuple = ()) -> list[dict]:
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             async with db.execute(query, params) as cursor:
                 rows = await cursor.fetchall()
                 return [dict(row) for row in rows]
 
     async def fetch_one(self, query: str, params: tuple = ()) -> Optional[dict]:
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             async with db.execute(query, params) as cursor:
                 row = await cursor.fetchone()
                 return dict(row) if row else None
 
     async def execute(self, query: str, params: tuple = ()) -> int:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             cursor = await db.execute(query, params)
             await db.commit()
             return cursor.lastrowid
 
+    @asynccontextmanager
+    async def transaction(self, outer: Optional[UnitOfWork] = None):
+        """Открывает транзакцию на пишущем соединении; при ошибке все записи откатываются.
+        Если передана внешняя транзакция outer, записи выполняются в ней и фиксируются вместе с ней"""
+        if outer is not None:
+            yield outer
+            return
+        async with self.pool.writer() as db:
+            tx = UnitOfWork(db)
+            yield tx
+            for name in sorted(tx.touched):
+                await self.bump_cache_version(db, name)
+            await db.commit()
+        if tx.touched:
+            self._cache_versions = None
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Берет или продлевает аренду name для owner на ttl секунд; False, если ее держит другой владелец"""
+        now = time.time()
+        async with self.pool.writer() as db:
+            async with db.execute("""
+                INSERT INTO worker_leases (name, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE worker_leases.owner = excluded.owner OR worker_leases.expires_at <= ?
+                RETURNING owner
+            """, (name, owner, now + ttl, now)) as cursor:
+                acquired = await cursor.fetchone() is not None
+            await db.commit()
+        return acquired
+
+    async def release_lease(self, name: str, owner: str):
+        await self.execute("DELETE FROM worker_leases WHERE name = ? AND owner = ?", (name, owner))
+
+    async def get_cache_versions(self) -> dict:
+        """Версии данных из cache_versions; сверяются с SQLite не чаще CACHE_VERSION_CHECK_INTERVAL"""
+        now = time.monotonic()
+        if self._cache_versions is None or now - self._cache_versions_checked_at >= settings.CACHE_VERSION_CHECK_INTERVAL:
+            rows = await self.fetch_all("SELECT name, version FROM cache_versions")
+            self._cache_versions = {row["name"]: row["version"] for row in rows}
+            self._cache_versions_checked_at = now
+        return self._cache_versions
+
+    async def bump_cache_version(self, db, name: str):
+        """Увеличивает версию данных внутри текущей транзакции пишущего соединения"""
+        await db.execute("""
+            INSERT INTO cache_versions (name, version) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET version = version + 1
+        """, (name,))
+
+    async def touch_cache(self, *names: str):
+        """Отмечает изменение данных: кэши всех воркеров, зависящие от names, становятся устаревшими"""
+        async with self.pool.writer() as db:
+            for name in names:
+                await self.bump_cache_version(db, name)
+            await db.commit()
+        self._cache_versions = None
+
     async def get_settings(self) -> dict:
-        rows = await self.fetch_all("SELECT key, value FROM settings")
-        return {row["key"]: row["value"] for row in rows}
+        versions = await self.get_cache_versions()
+        version = (versions.get("settings", 0), versions.get("settings_internal", 0))
+        if self._settings_cache is None or version != self._settings_version:
+            rows = await self.fetch_all("SELECT key, value FROM settings")
+            self._settings_cache = {row["key"]: row["value"] for row in rows}
+            self._settings_version = version
+        return dict(self._settings_cache)
 
     async def update_settings(self, values: dict):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             for key, value in values.items():
                 await db.execute("""
                     INSERT INTO settings (key, value) VALUES (?, ?)
                     ON CONFLICT(key) DO UPDATE SET value = excluded.value
                 """, (key, value or ""))
+            public_keys = set(values) - INTERNAL_SETTINGS_KEYS
+            await self.bump_cache_version(db, "settings" if public_keys else "settings_internal")
             await db.commit()
+        self._cache_versions = None
 
     async def get_services(self, active_only: bool = True) -> list[dict]:
         where = "WHERE is_active = 1" if active_only else ""
@@ -830,7 +1793,7 @@ class Database:
             WHERE services.slug = ? AND services.is_active = 1
         """, (slug,))
 
-    async def save_service(self, form: dict):
+    async def save_service(self, form: dict, tx: Optional[UnitOfWork] = None):
         service_id = form.get("id")
         title = (form.get("title") or "").strip()
         slug = slugify(form.get("slug") or title)
@@ -854,46 +1817,51 @@ class Database:
             int(form["portfolio_category_id"]) if form.get("portfolio_category_id") else None,
             1 if form.get("is_active") == "on" else 0,
         )
-        if service_id:
-            await self.execute("""
-                UPDATE services
-                SET title=?, slug=?, description=?, service_includes=?, suitable_for=?, h1_title=?, detailed_description=?, preparation_text=?,
-                    duration=?, price=?, sort_order=?, seo_title=?, seo_description=?,
-                    is_hit=?, is_popular=?, service_group=?, portfolio_category_id=?, is_active=?
-                WHERE id=?
-            """, values + (service_id,))
-            return int(service_id)
-        else:
-            return await self.execute("""
-                INSERT INTO services
-                (title, slug, description, service_includes, suitable_for, h1_title, detailed_description, preparation_text,
-                 duration, price, sort_order, seo_title, seo_description, is_hit, is_popular, service_group, portfolio_category_id, is_active)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, values)
+        async with self.transaction(tx) as tx:
+            if service_id:
+                await tx.execute("""
+                    UPDATE services
+                    SET title=?, slug=?, description=?, service_includes=?, suitable_for=?, h1_title=?, detailed_description=?, preparation_text=?,
+                        duration=?, price=?, sort_order=?, seo_title=?, seo_description=?,
+                        is_hit=?, is_popular=?, service_group=?, portfolio_category_id=?, is_active=?
+                    WHERE id=?
+                """, values + (service_id,))
+                saved_id = int(service_id)
+            else:
+                saved_id = await tx.execute("""
+                    INSERT INTO services
+                    (title, slug, description, service_includes, suitable_for, h1_title, detailed_description, preparation_text,
+                     duration, price, sort_order, seo_title, seo_description, is_hit, is_popular, service_group, portfolio_category_id, is_active)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, values)
+            tx.touch("services")
+        return saved_id
 
     async def delete_service(self, service_id: int):
         service = await self.fetch_one("SELECT slug FROM services WHERE id = ?", (service_id,))
-        if service:
-            await self.execute("""
-                INSERT INTO deleted_seed_services (slug, deleted_at)
-                VALUES (?, ?)
-                ON CONFLICT(slug) DO UPDATE SET deleted_at = excluded.deleted_at
-            """, (service["slug"], get_moscow_time().strftime("%Y-%m-%d %H:%M:%S")))
-        await self.execute("DELETE FROM service_faq WHERE service_id = ?", (service_id,))
-        await self.execute("DELETE FROM service_related_services WHERE service_id = ? OR related_service_id = ?", (service_id, service_id))
-        await self.execute("DELETE FROM service_related_posts WHERE service_id = ?", (service_id,))
-        await self.execute("UPDATE reviews SET service_id = NULL WHERE service_id = ?", (service_id,))
-        await self.execute("UPDATE portfolio_photos SET service_id = NULL WHERE service_id = ?", (service_id,))
-        await self.execute("DELETE FROM services WHERE id = ?", (service_id,))
-
-    async def save_service_extensions(self, service_id: int, form):
+        async with self.transaction() as tx:
+            if service:
+                await tx.execute("""
+                    INSERT INTO deleted_seed_services (slug, deleted_at)
+                    VALUES (?, ?)
+                    ON CONFLICT(slug) DO UPDATE SET deleted_at = excluded.deleted_at
+                """, (service["slug"], get_moscow_time().strftime("%Y-%m-%d %H:%M:%S")))
+            await tx.execute("DELETE FROM service_faq WHERE service_id = ?", (service_id,))
+            await tx.execute("DELETE FROM service_related_services WHERE service_id = ? OR related_service_id = ?", (service_id, service_id))
+            await tx.execute("DELETE FROM service_related_posts WHERE service_id = ?", (service_id,))
+            await tx.execute("UPDATE reviews SET service_id = NULL WHERE service_id = ?", (service_id,))
+            await tx.execute("UPDATE portfolio_photos SET service_id = NULL WHERE service_id = ?", (service_id,))
+            await tx.execute("DELETE FROM services WHERE id = ?", (service_id,))
+            tx.touch("services", "reviews", "portfolio", "blog")
+
+    async def save_service_extensions(self, service_id: int, form, tx: Optional[UnitOfWork] = None):
         faq_ids_to_delete = {str(item) for item in form_getlist(form, "faq_delete")}
         faq_ids = form_getlist(form, "faq_id")
         faq_questions = form_getlist(form, "faq_question")
         faq_answers = form_getlist(form, "faq_answer")
         faq_orders = form_getlist(form, "faq_sort_order")
 
-        await self.execute("DELETE FROM service_faq WHERE service_id = ?", (service_id,))
+        faq_rows = []
         for index, question in enumerate(faq_questions):
             answer = faq_answers[index] if index < len(faq_answers) else ""
             original_id = str(faq_ids[index]) if index < len(faq_ids) else ""
@@ -907,12 +1875,9 @@ class Database:
                 sort_order = int(faq_orders[index]) if index < len(faq_orders) and faq_orders[index] else index * 10
             except ValueError:
                 sort_order = index * 10
-            await self.execute("""
-                INSERT INTO service_faq (service_id, question, answer, sort_order, is_active)
-                VALUES (?, ?, ?, ?, 1)
-            """, (service_id, question, answer, sort_order))
+            faq_rows.append((service_id, question, answer, sort_order))
 
-        await self.execute("DELETE FROM service_related_services WHERE service_id = ?", (service_id,))
+        related_service_rows = []
         seen_services = set()
         for index, related_id in enumerate(form_getlist(form, "related_service_ids")):
             try:
@@ -922,12 +1887,9 @@ class Database:
             if related_id_int == service_id or related_id_int in seen_services:
                 continue
             seen_services.add(related_id_int)
-            await self.execute("""
-                INSERT INTO service_related_services (service_id, related_service_id, sort_order)
-                VALUES (?, ?, ?)
-            """, (service_id, related_id_int, index * 10))
+            related_service_rows.append((service_id, related_id_int, index * 10))
 
-        await self.execute("DELETE FROM service_related_posts WHERE service_id = ?", (service_id,))
+        related_post_rows = []
         seen_posts = set()
         for index, post_id in enumerate(form_getlist(form, "related_post_ids")):
             try:
@@ -937,10 +1899,25 @@ class Database:
             if post_id_int in seen_posts:
                 continue
             seen_posts.add(post_id_int)
-            await self.execute("""
+            related_post_rows.append((service_id, post_id_int, index * 10))
+
+        async with self.transaction(tx) as tx:
+            await tx.execute("DELETE FROM service_faq WHERE service_id = ?", (service_id,))
+            await tx.executemany("""
+                INSERT INTO service_faq (service_id, question, answer, sort_order, is_active)
+                VALUES (?, ?, ?, ?, 1)
+            """, faq_rows)
+            await tx.execute("DELETE FROM service_related_services WHERE service_id = ?", (service_id,))
+            await tx.executemany("""
+                INSERT INTO service_related_services (service_id, related_service_id, sort_order)
+                VALUES (?, ?, ?)
+            """, related_service_rows)
+            await tx.execute("DELETE FROM service_related_posts WHERE service_id = ?", (service_id,))
+            await tx.executemany("""
                 INSERT INTO service_related_posts (service_id, post_id, sort_order)
                 VALUES (?, ?, ?)
-            """, (service_id, post_id_int, index * 10))
+            """, related_post_rows)
+            tx.touch("services", "blog")
 
     async def get_service_faq(self, service_id: int, active_only: bool = True) -> list[dict]:
         where = "AND is_active = 1" if active_only else ""
@@ -982,13 +1959,7 @@ class Database:
     async def get_related_posts(self, service_id: int, visible_only: bool = True) -> list[dict]:
         visible_filter = "AND posts.is_visible = 1" if visible_only else ""
         posts = await self.fetch_all(f"""
-            SELECT posts.*,
-                   COALESCE(posts.first_image, (
-                       SELECT image_path FROM blog_photos
-                       WHERE blog_photos.post_id = posts.id
-                       ORDER BY sort_order, id
-                       LIMIT 1
-                   )) AS preview_image
+            SELECT posts.*
             FROM service_related_posts links
             JOIN blog_posts posts ON posts.id = links.post_id
             WHERE links.service_id = ? AND posts.is_deleted = 0 {visible_filter}
@@ -1012,11 +1983,53 @@ class Database:
             "post_ids": [row["post_id"] for row in post_rows],
         }
 
+    async def get_service_faq_by_service_ids(self, service_ids: list[int], active_only: bool = True) -> dict[int, list[dict]]:
+        """FAQ нескольких услуг одним запросом: {service_id: [вопросы]}"""
+        if not service_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in service_ids)
+        where = "AND is_active = 1" if active_only else ""
+        rows = await self.fetch_all(f"""
+            SELECT * FROM service_faq
+            WHERE service_id IN ({placeholders}) {where}
+            ORDER BY sort_order, id
+        """, tuple(service_ids))
+        faq = {service_id: [] for service_id in service_ids}
+        for row in rows:
+            faq[row["service_id"]].append(row)
+        return faq
+
+    async def get_service_related_ids_by_service_ids(self, service_ids: list[int]) -> dict[int, dict]:
+        """Связанные услуги и посты нескольких услуг за два запроса: {service_id: {"service_ids", "post_ids"}}"""
+        if not service_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in service_ids)
+        service_rows, post_rows = await asyncio.gather(
+            self.fetch_all(f"""
+                SELECT service_id, related_service_id FROM service_related_services
+                WHERE service_id IN ({placeholders})
+                ORDER BY sort_order, id
+            """, tuple(service_ids)),
+            self.fetch_all(f"""
+                SELECT service_id, post_id FROM service_related_posts
+                WHERE service_id IN ({placeholders})
+                ORDER BY sort_order, id
+            """, tuple(service_ids)),
+        )
+        related = {service_id: {"service_ids": [], "post_ids": []} for service_id in service_ids}
+        for row in service_rows:
+            related[row["service_id"]]["service_ids"].append(row["related_service_id"])
+        for row in post_rows:
+            related[row["service_id"]]["post_ids"].append(row["post_id"])
+        return related
+
     async def get_reviews(
         self,
         active_only: bool = True,
         service_id: Optional[int] = None,
         global_only: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0,
     ) -> list[dict]:
         clauses = []
         params = []
@@ -1028,12 +2041,14 @@ class Database:
         elif global_only:
             clauses.append("reviews.service_id IS NULL")
         where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        limit_clause = f"LIMIT {int(limit)} OFFSET {int(offset)}" if limit else ""
         return await self.fetch_all(f"""
             SELECT reviews.*, services.title AS service_title
             FROM reviews
             LEFT JOIN services ON services.id = reviews.service_id
             {where}
             ORDER BY reviews.created_at DESC, reviews.id DESC
+            {limit_clause}
         """, tuple(params))
 
     async def save_review(self, form: dict):
@@ -1055,6 +2070,7 @@ class Database:
                 "INSERT INTO reviews (service_id, client_name, text, created_at, is_active) VALUES (?, ?, ?, ?, ?)",
                 values,
             )
+        await self.touch_cache("reviews")
 
     async def delete_review(self, review_id: int):
         review = await self.fetch_one("SELECT client_name, text FROM reviews WHERE id = ?", (review_id,))
@@ -1065,6 +2081,7 @@ class Database:
                 ON CONFLICT(review_key) DO UPDATE SET deleted_at = excluded.deleted_at
             """, (f"{review['client_name']}|{review['text']}", get_moscow_time().strftime("%Y-%m-%d %H:%M:%S")))
         await self.execute("DELETE FROM reviews WHERE id = ?", (review_id,))
+        await self.touch_cache("reviews")
 
     async def get_gallery(self, active_only: bool = True) -> list[dict]:
         where = "WHERE is_active = 1" if active_only else ""
@@ -1111,16 +2128,23 @@ class Database:
             "SELECT * FROM portfolio_categories WHERE slug = ? AND is_active = 1 AND is_deleted = 0",
             (slug,),
         )
-        if category:
-            category["photos"] = await self.fetch_all("""
-                SELECT portfolio_photos.*, services.title AS service_title, services.slug AS service_slug
-                FROM portfolio_photos
-                LEFT JOIN services ON services.id = portfolio_photos.service_id
-                WHERE portfolio_photos.category_id = ? AND portfolio_photos.is_active = 1
-                ORDER BY portfolio_photos.sort_order, portfolio_photos.id
-            """, (category["id"],))
         return category
 
+    async def get_portfolio_photos_page(
+        self,
+        category_id: int,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        limit: int = 24,
+    ) -> dict:
+        """Активные фото раздела по курсору (sort_order, id)"""
+        return await self.fetch_keyset_page("""
+            SELECT portfolio_photos.*, services.title AS service_title, services.slug AS service_slug
+            FROM portfolio_photos
+            LEFT JOIN services ON services.id = portfolio_photos.service_id
+            WHERE portfolio_photos.category_id = ? AND portfolio_photos.is_active = 1
+        """, (category_id,), (("portfolio_photos.sort_order", "sort_order"), ("portfolio_photos.id", "id")), False, limit, after, before)
+
     async def save_portfolio_category(self, form: dict):
         category_id = form.get("id")
         title = (form.get("title") or "").strip()
@@ -1143,6 +2167,7 @@ class Database:
                 INSERT INTO portfolio_categories (title, slug, description, sort_order, is_active)
                 VALUES (?, ?, ?, ?, ?)
             """, values)
+        await self.touch_cache("portfolio")
 
     async def delete_portfolio_category(self, category_id: int):
         category = await self.fetch_one("SELECT slug FROM portfolio_categories WHERE id = ?", (category_id,))
@@ -1162,10 +2187,11 @@ class Database:
             SET is_active = 0, category_id = NULL
             WHERE category_id = ?
         """, (category_id,))
+        await self.touch_cache("portfolio")
 
-    async def get_portfolio_photos(self, active_only: bool = False, limit: Optional[int] = None) -> list[dict]:
+    async def get_portfolio_photos(self, active_only: bool = False, limit: Optional[int] = None, offset: int = 0) -> list[dict]:
         where = "WHERE portfolio_photos.is_active = 1" if active_only else ""
-        limit_clause = f"LIMIT {int(limit)}" if limit else ""
+        limit_clause = f"LIMIT {int(limit)} OFFSET {int(offset)}" if limit else ""
         return await self.fetch_all(f"""
             SELECT portfolio_photos.*, portfolio_categories.title AS category_title, portfolio_categories.slug AS category_slug, services.title AS service_title
             FROM portfolio_photos
@@ -1189,6 +2215,7 @@ class Database:
             int(form.get("sort_order") or 0),
             get_moscow_time().strftime("%Y-%m-%d %H:%M:%S"),
         ))
+        await self.touch_cache("portfolio")
 
     async def update_portfolio_photo(self, form: dict):
         await self.execute("""
@@ -1203,9 +2230,11 @@ class Database:
             1 if form.get("is_active") == "on" else 0,
             form.get("id"),
         ))
+        await self.touch_cache("portfolio")
 
     async def delete_portfolio_photo(self, photo_id: int):
         await self.execute("DELETE FROM portfolio_photos WHERE id = ?", (photo_id,))
+        await self.touch_cache("portfolio")
 
     async def unique_blog_category_slug(self, title: str, category_id: Optional[int] = None) -> str:
         base_slug = slugify(title)
@@ -1228,13 +2257,14 @@ class Database:
             ORDER BY blog_categories.sort_order, blog_categories.title
         """)
 
-    async def ensure_blog_category(self, title: str):
+    async def ensure_blog_category(self, title: str, tx: Optional[UnitOfWork] = None):
         normalized_title = normalize_blog_category(title)
         slug = await self.unique_blog_category_slug(normalized_title)
-        await self.execute("""
-            INSERT OR IGNORE INTO blog_categories (title, slug, sort_order)
-            VALUES (?, ?, 100)
-        """, (normalized_title, slug))
+        async with self.transaction(tx) as tx:
+            await tx.execute("""
+                INSERT OR IGNORE INTO blog_categories (title, slug, sort_order)
+                VALUES (?, ?, 100)
+            """, (normalized_title, slug))
 
     async def save_blog_category(self, form: dict):
         category_id = int(form["id"]) if form.get("id") else None
@@ -1264,6 +2294,7 @@ class Database:
                 INSERT INTO blog_categories (title, slug, sort_order)
                 VALUES (?, ?, ?)
             """, (title, slug, sort_order))
+        await self.touch_cache("blog")
 
     async def delete_blog_category(self, category_id: int):
         category = await self.fetch_one("SELECT title, slug FROM blog_categories WHERE id = ?", (category_id,))
@@ -1280,6 +2311,7 @@ class Database:
             (BLOG_DEFAULT_CATEGORY, category["title"]),
         )
         await self.execute("DELETE FROM blog_categories WHERE id = ?", (category_id,))
+        await self.touch_cache("blog")
 
     def normalize_blog_post(self, post: dict) -> dict:
         text = post.get("text_markdown", "")
@@ -1289,7 +2321,7 @@ class Database:
         post["seo_title"] = truncate_meta(post.get("seo_title"), 70, f"{post['title']} — Тина Борке")
         post["seo_description"] = truncate_meta(post.get("seo_description"), 160, post.get("excerpt") or text)
         post["cover_image"] = post.get("cover_image") or post.get("preview_image") or post.get("first_image") or ""
-        if post["cover_image"] and not Path(post["cover_image"].lstrip("/")).exists():
+        if post["cover_image"] and not static_assets.exists(post["cover_image"]):
             post["cover_image"] = ""
         post["cover_alt"] = post.get("cover_alt") or f"{post['title']} — материал визажиста Тины Борке"
         post["status"] = normalize_blog_status(post.get("status"))
@@ -1301,6 +2333,8 @@ class Database:
         visible_only: bool = True,
         include_deleted: bool = False,
         indexable_only: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0,
     ) -> list[dict]:
         clauses = []
         if visible_only:
@@ -1311,43 +2345,146 @@ class Database:
         if indexable_only:
             clauses.append("blog_posts.is_indexable = 1")
         where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        limit_clause = f"LIMIT {int(limit)} OFFSET {int(offset)}" if limit else ""
         posts = await self.fetch_all(f"""
-            SELECT blog_posts.*,
-                   COALESCE(blog_posts.cover_image, blog_posts.first_image, (
-                       SELECT image_path FROM blog_photos
-                       WHERE blog_photos.post_id = blog_posts.id
-                       ORDER BY sort_order, id
-                       LIMIT 1
-                   )) AS preview_image,
-                   (SELECT COUNT(*) FROM blog_photos WHERE blog_photos.post_id = blog_posts.id) AS photo_count
+            SELECT blog_posts.*
             FROM blog_posts
             {where}
             ORDER BY blog_posts.created_at DESC, blog_posts.id DESC
+            {limit_clause}
         """)
         for post in posts:
             self.normalize_blog_post(post)
         return posts
 
+    async def get_blog_posts_page(
+        self,
+        category: str = "",
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        limit: int = 12,
+    ) -> dict:
+        """Опубликованные посты по курсору (created_at, id), новые сверху; category — название рубрики"""
+        query = """
+            SELECT blog_posts.*
+            FROM blog_posts
+            WHERE blog_posts.is_visible = 1 AND blog_posts.status = 'published' AND blog_posts.is_deleted = 0
+        """
+        params = ()
+        if category:
+            query += " AND blog_posts.category = ?"
+            params = (category,)
+        page = await self.fetch_keyset_page(
+            query, params, (("blog_posts.created_at", "created_at"), ("blog_posts.id", "id")), True, limit, after, before,
+        )
+        for post in page["items"]:
+            self.normalize_blog_post(post)
+        return page
+
+    async def search(self, text: str, limit: int = 20) -> list[dict]:
+        """Полнотекстовый поиск по опубликованным постам, активным услугам и их FAQ.
+        Результаты трех индексов сливаются по bm25, совпадение в заголовке весит больше совпадения в тексте.
+        Сначала ищутся записи со всеми словами запроса, если таких нет — с любым из них"""
+        terms = search_terms(text)
+        if not terms:
+            return []
+        for match in dict.fromkeys((" ".join(terms), " OR ".join(terms))):
+            rows = await self._search_rows(match, limit)
+            if rows:
+                break
+        return [
+            {"kind": row["kind"], "title": row["title"], "url": row["url"], "snippet_html": search_snippet_html(row["snippet"])}
+            for row in rows
+        ]
+
+    async def _search_rows(self, match: str, limit: int) -> list[dict]:
+        marks = (SEARCH_MARK_START, SEARCH_MARK_END)
+        return await self.fetch_all("""
+            SELECT 'post' AS kind, blog_posts.title AS title, '/blog/' || blog_posts.slug AS url,
+                   snippet(search_posts, 1, ?, ?, '…', 24) AS snippet, bm25(search_posts, 10.0, 1.0) AS score
+            FROM search_posts
+            JOIN blog_posts ON blog_posts.id = search_posts.rowid
+            WHERE search_posts MATCH ?
+              AND blog_posts.is_visible = 1 AND blog_posts.status = 'published' AND blog_posts.is_deleted = 0
+            UNION ALL
+            SELECT 'service', services.title, '/uslugi/' || services.slug,
+                   snippet(search_services, 1, ?, ?, '…', 24), bm25(search_services, 10.0, 1.0)
+            FROM search_services
+            JOIN services ON services.id = search_services.rowid
+            WHERE search_services MATCH ? AND services.is_active = 1
+            UNION ALL
+            SELECT 'faq', service_faq.question, '/uslugi/' || services.slug || '#faq',
+                   snippet(search_faq, 1, ?, ?, '…', 24), bm25(search_faq, 10.0, 1.0)
+            FROM search_faq
+            JOIN service_faq ON service_faq.id = search_faq.rowid
+            JOIN services ON services.id = service_faq.service_id
+            WHERE search_faq MATCH ? AND service_faq.is_active = 1 AND services.is_active = 1
+            ORDER BY score
+            LIMIT ?
+        """, (*marks, match, *marks, match, *marks, match, limit))
+
+    async def get_blog_post_options(self) -> list[dict]:
+        """Короткий список постов (id и подпись) для чекбоксов связей в админке"""
+        rows = await self.fetch_all("""
+            SELECT id, title, substr(text_markdown, 1, 400) AS text_markdown
+            FROM blog_posts
+            WHERE is_deleted = 0
+            ORDER BY created_at DESC, id DESC
+        """)
+        return [{"id": row["id"], "admin_label": admin_post_label(row)} for row in rows]
+
+    async def get_blog_photos_by_post_ids(self, post_ids: list[int]) -> dict[int, list[dict]]:
+        """Фото нескольких постов одним запросом: {post_id: [фото]}"""
+        if not post_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in post_ids)
+        rows = await self.fetch_all(f"""
+            SELECT * FROM blog_photos
+            WHERE post_id IN ({placeholders})
+            ORDER BY sort_order, id
+        """, tuple(post_ids))
+        photos = {post_id: [] for post_id in post_ids}
+        for row in rows:
+            photos[row["post_id"]].append(row)
+        return photos
+
+    async def get_related_service_ids_by_post_ids(self, post_ids: list[int]) -> dict[int, list[int]]:
+        """ID услуг, связанных с несколькими постами, одним запросом: {post_id: [service_id]}"""
+        if not post_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in post_ids)
+        rows = await self.fetch_all(f"""
+            SELECT post_id, service_id FROM service_related_posts
+            WHERE post_id IN ({placeholders})
+            ORDER BY sort_order, id
+        """, tuple(post_ids))
+        related = {post_id: [] for post_id in post_ids}
+        for row in rows:
+            related[row["post_id"]].append(row["service_id"])
+        return related
+
     async def get_blog_post(self, slug: str) -> Optional[dict]:
         post = await self.fetch_one(
             "SELECT * FROM blog_posts WHERE slug = ? AND is_visible = 1 AND is_deleted = 0 AND status = 'published'",
             (slug,),
         )
         if post:
-            post["photos"] = await self.fetch_all("SELECT * FROM blog_photos WHERE post_id = ? ORDER BY sort_order, id", (post["id"],))
-            post["preview_image"] = post.get("cover_image") or post.get("first_image") or (post["photos"][0]["image_path"] if post["photos"] else "")
-            post["related_services"] = await self.get_blog_related_services(post["id"])
+            post["photos"], post["related_services"] = await asyncio.gather(
+                self.fetch_all("SELECT * FROM blog_photos WHERE post_id = ? ORDER BY sort_order, id", (post["id"],)),
+                self.get_blog_related_services(post["id"]),
+            )
             self.normalize_blog_post(post)
         return post
 
     async def get_blog_post_by_id(self, post_id: int) -> Optional[dict]:
         post = await self.fetch_one("SELECT * FROM blog_posts WHERE id = ? AND is_deleted = 0", (post_id,))
         if post:
-            post["photos"] = await self.fetch_all("SELECT * FROM blog_photos WHERE post_id = ? ORDER BY sort_order, id", (post["id"],))
-            post["preview_image"] = post.get("cover_image") or post.get("first_image") or (post["photos"][0]["image_path"] if post["photos"] else "")
-            related_ids = await self.fetch_all(
-                "SELECT service_id FROM service_related_posts WHERE post_id = ? ORDER BY sort_order, id",
-                (post_id,),
+            post["photos"], related_ids = await asyncio.gather(
+                self.fetch_all("SELECT * FROM blog_photos WHERE post_id = ? ORDER BY sort_order, id", (post["id"],)),
+                self.fetch_all(
+                    "SELECT service_id FROM service_related_posts WHERE post_id = ? ORDER BY sort_order, id",
+                    (post_id,),
+                ),
             )
             post["related_service_ids"] = [row["service_id"] for row in related_ids]
             self.normalize_blog_post(post)
@@ -1392,7 +2529,6 @@ class Database:
             status = "draft"
             is_visible = 0
         excerpt = truncate_meta(form.get("excerpt"), 180, text_markdown)
-        await self.ensure_blog_category(category)
         text_html = "<br>".join(html.escape(line) for line in text_markdown.splitlines())
         values = (
             form.get("telegram_message_id") or None,
@@ -1412,26 +2548,29 @@ class Database:
             truncate_meta(form.get("seo_title"), 70, f"{title} — Тина Борке"),
             truncate_meta(form.get("seo_description"), 160, excerpt or text_markdown),
         )
-        if post_id:
-            await self.execute("""
-                UPDATE blog_posts
-                SET telegram_message_id=?, title=?, slug=?, text_html=?, text_markdown=?, excerpt=?, category=?, first_image=?,
-                    cover_image=?, cover_alt=?, created_at=?, is_visible=?, status=?, is_indexable=?, seo_title=?, seo_description=?
-                WHERE id=?
-            """, values + (post_id,))
-            saved_id = int(post_id)
-        else:
-            saved_id = await self.execute("""
-                INSERT INTO blog_posts
-                (telegram_message_id, title, slug, text_html, text_markdown, excerpt, category, first_image, cover_image, cover_alt,
-                 created_at, is_visible, status, is_indexable, seo_title, seo_description)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, values)
-        await self.save_blog_related_services(saved_id, form_getlist(form, "related_service_ids"))
+        # Категория, пост и связи с услугами фиксируются одним COMMIT
+        async with self.transaction() as tx:
+            await self.ensure_blog_category(category, tx)
+            if post_id:
+                await tx.execute("""
+                    UPDATE blog_posts
+                    SET telegram_message_id=?, title=?, slug=?, text_html=?, text_markdown=?, excerpt=?, category=?, first_image=?,
+                        cover_image=?, cover_alt=?, created_at=?, is_visible=?, status=?, is_indexable=?, seo_title=?, seo_description=?
+                    WHERE id=?
+                """, values + (post_id,))
+                saved_id = int(post_id)
+            else:
+                saved_id = await tx.execute("""
+                    INSERT INTO blog_posts
+                    (telegram_message_id, title, slug, text_html, text_markdown, excerpt, category, first_image, cover_image, cover_alt,
+                     created_at, is_visible, status, is_indexable, seo_title, seo_description)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, values)
+            await self.save_blog_related_services(saved_id, form_getlist(form, "related_service_ids"), tx)
         return saved_id
 
-    async def save_blog_related_services(self, post_id: int, service_ids: list):
-        await self.execute("DELETE FROM service_related_posts WHERE post_id = ?", (post_id,))
+    async def save_blog_related_services(self, post_id: int, service_ids: list, tx: Optional[UnitOfWork] = None):
+        rows = []
         seen = set()
         for index, service_id in enumerate(service_ids):
             if not service_id:
@@ -1443,10 +2582,14 @@ class Database:
             if service_id_int in seen:
                 continue
             seen.add(service_id_int)
-            await self.execute("""
+            rows.append((service_id_int, post_id, index * 10))
+        async with self.transaction(tx) as tx:
+            await tx.execute("DELETE FROM service_related_posts WHERE post_id = ?", (post_id,))
+            await tx.executemany("""
                 INSERT INTO service_related_posts (service_id, post_id, sort_order)
                 VALUES (?, ?, ?)
-            """, (service_id_int, post_id, index * 10))
+            """, rows)
+            tx.touch("blog")
 
     async def toggle_blog_post(self, post_id: int):
         await self.execute("""
@@ -1456,23 +2599,44 @@ class Database:
                 is_indexable = CASE is_visible WHEN 1 THEN 0 ELSE is_indexable END
             WHERE id = ? AND is_deleted = 0
         """, (post_id,))
+        await self.touch_cache("blog")
 
     async def delete_blog_post(self, post_id: int):
         await self.execute("UPDATE blog_posts SET is_deleted = 1, is_visible = 0 WHERE id = ?", (post_id,))
+        await self.touch_cache("blog")
 
-    async def add_blog_photo(self, post_id: int, image_path: str, alt_text: str = "", sort_order: int = 0):
-        await self.execute("""
-            INSERT INTO blog_photos (post_id, image_path, alt_text, sort_order, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        """, (post_id, image_path, alt_text or "Фото к посту", sort_order, get_moscow_time().strftime("%Y-%m-%d %H:%M:%S")))
+    async def add_blog_photo(
+        self,
+        post_id: int,
+        image_path: str,
+        alt_text: str = "",
+        sort_order: int = 0,
+        telegram_message_id: Optional[str] = None,
+    ) -> bool:
+        """Добавляет фото к посту; False, если фото этого сообщения Telegram уже сохранено"""
+        async with self.pool.writer() as db:
+            cursor = await db.execute("""
+                INSERT OR IGNORE INTO blog_photos (post_id, image_path, alt_text, sort_order, created_at, telegram_message_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                post_id, image_path, alt_text or "Фото к посту", sort_order,
+                get_moscow_time().strftime("%Y-%m-%d %H:%M:%S"), telegram_message_id,
+            ))
+            await db.commit()
+        if not cursor.rowcount:
+            return False
+        await self.touch_cache("blog")
+        return True
 
     async def update_blog_photo(self, form: dict):
         await self.execute("""
             UPDATE blog_photos SET alt_text=?, sort_order=? WHERE id=?
         """, (form.get("alt_text") or "", int(form.get("sort_order") or 0), form.get("id")))
+        await self.touch_cache("blog")
 
     async def delete_blog_photo(self, photo_id: int):
         await self.execute("DELETE FROM blog_photos WHERE id = ?", (photo_id,))
+        await self.touch_cache("blog")
 
     async def set_telegram_import_status(self, count: int = 0, error: str = ""):
         await self.update_settings({
@@ -1481,224 +2645,457 @@ class Database:
             "telegram_import_last_error": error[:500],
         })
 
-    async def save_telegram_photo(self, client: httpx.AsyncClient, file_id: str, message_key: str, sort_order: int) -> Optional[str]:
-        file_response = await client.get(
-            f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/getFile",
-            params={"file_id": file_id},
+    async def create_image_variants(self, image_paths: list[str]):
+        """Строит WebP-варианты для загруженных изображений и записывает их в image_variants"""
+        if Image is None:
+            logger.warning("Pillow не установлен - адаптивные варианты изображений не создаются")
+            return
+        loop = asyncio.get_running_loop()
+        executor = get_image_executor()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(executor, render_image_variants, path) for path in image_paths),
+            return_exceptions=True,
         )
-        if file_response.status_code != 200:
-            logger.warning("Telegram photo getFile failed without exposing token: %s", file_response.status_code)
-            return None
-        file_payload = file_response.json()
-        if not file_payload.get("ok"):
-            logger.warning("Telegram photo getFile API error: %s", file_payload.get("description", "unknown error"))
-            return None
-        file_path = file_payload.get("result", {}).get("file_path", "")
-        if not file_path:
-            return None
-        suffix = Path(file_path).suffix.lower() or ".jpg"
-        if suffix not in ALLOWED_IMAGE_EXTENSIONS:
-            suffix = ".jpg"
-        photo_response = await client.get(f"https://api.telegram.org/file/bot{settings.TELEGRAM_BOT_TOKEN}/{file_path}")
-        if photo_response.status_code != 200 or len(photo_response.content) > 8 * 1024 * 1024:
-            logger.warning("Telegram photo download skipped: status=%s", photo_response.status_code)
+        rows = []
+        for image_path, result in zip(image_paths, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Не удалось построить варианты изображения {image_path}: {result}")
+                continue
+            for item in result:
+                static_assets.add(item["variant_path"])
+            rows.extend((image_path, item["width"], item["format"], item["variant_path"]) for item in result)
+        if not rows:
+            return
+        async with self.pool.writer() as db:
+            await db.executemany("""
+                INSERT INTO image_variants (image_path, width, format, variant_path)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(image_path, width, format) DO UPDATE SET variant_path = excluded.variant_path
+            """, rows)
+            await self.bump_cache_version(db, "images")
+            await db.commit()
+        self._cache_versions = None
+
+    async def get_image_variants(self) -> dict:
+        """Словарь «исходный путь -> srcset» для шаблонов, кэшируется до изменения версии images"""
+        versions = await self.get_cache_versions()
+        version = versions.get("images", 0)
+        if self._image_variants is None or version != self._image_variants_version:
+            rows = await self.fetch_all("""
+                SELECT image_path, width, variant_path FROM image_variants
+                WHERE format = 'webp'
+                ORDER BY image_path, width
+            """)
+            srcsets = {}
+            for row in rows:
+                srcsets.setdefault(row["image_path"], []).append(f"{row['variant_path']} {row['width']}w")
+            self._image_variants = {path: ", ".join(items) for path, items in srcsets.items()}
+            self._image_variants_version = version
+        return self._image_variants
+
+    async def import_telegram_updates(self, poll_timeout: int = 0) -> Optional[int]:
+        """Импортирует новые посты канала; None, если импорт сейчас выполняет другой процесс или задача.
+        Параллельные getUpdates одного бота Telegram отклоняет с 409 и они гоняются за telegram_import_offset"""
+        owner = f"{os.getpid()}:{uuid4().hex[:8]}"
+        ttl = TELEGRAM_IMPORT_LEASE_SECONDS + poll_timeout
+        if not await self.acquire_lease(TELEGRAM_IMPORT_LEASE, owner, ttl):
             return None
-        target_dir = Path("static/blog_photos")
-        target_dir.mkdir(parents=True, exist_ok=True)
-        safe_key = re.sub(r"[^a-zA-Z0-9_-]+", "-", message_key).strip("-") or uuid4().hex[:8]
-        target = target_dir / f"telegram_{safe_key}_{sort_order}_{uuid4().hex[:8]}{suffix}"
-        target.write_bytes(photo_response.content)
-        return "/" + str(target).replace("\\", "/")
-
-    async def import_telegram_updates(self) -> int:
+        started = time.perf_counter()
+        try:
+            imported, outcome = await self._import_telegram_updates(
+                poll_timeout, lambda: self.acquire_lease(TELEGRAM_IMPORT_LEASE, owner, ttl),
+            )
+        finally:
+            try:
+                await self.release_lease(TELEGRAM_IMPORT_LEASE, owner)
+            except Exception as e:
+                logger.warning(f"Не удалось освободить аренду импорта Telegram, она истечет через {ttl} с: {e}")
+        TELEGRAM_IMPORT_DURATION.labels(outcome).observe(time.perf_counter() - started)
+        TELEGRAM_IMPORTED_POSTS.inc(imported)
+        return imported
+
+    async def _import_telegram_updates(self, poll_timeout: int, renew_lease) -> tuple[int, str]:
         if settings.TELEGRAM_IMPORT_MODE != "bot_api":
             message = "Режим Telethon указан в .env, но Telethon-импорт в этом проекте пока не реализован. Используйте bot_api или добавьте отдельный скрипт Telethon."
             logger.warning(message)
             await self.set_telegram_import_status(0, message)
-            return 0
+            return 0, "skipped"
         if not settings.TELEGRAM_BOT_TOKEN:
             message = "TELEGRAM_BOT_TOKEN не настроен - импорт Telegram пропущен"
             logger.warning(message)
             await self.set_telegram_import_status(0, message)
-            return 0
+            return 0, "skipped"
         if not settings.TELEGRAM_CHANNEL_ID:
             message = "TELEGRAM_CHANNEL_ID не настроен - импорт не знает, какой канал читать"
             logger.warning(message)
             await self.set_telegram_import_status(0, message)
-            return 0
+            return 0, "skipped"
         url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/getUpdates"
         imported = 0
+        received = 0
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(url, params={"allowed_updates": json.dumps(["channel_post"])})
-                if response.status_code != 200:
-                    detail = response.text[:300]
-                    message = f"Telegram Bot API вернул {response.status_code}: {detail}"
-                    logger.warning("Telegram import failed without exposing token: %s", message)
-                    await self.set_telegram_import_status(0, message)
-                    return 0
-                payload = response.json()
-                if not payload.get("ok"):
-                    message = f"Telegram Bot API error: {payload.get('description', 'unknown error')}"
-                    logger.warning(message)
-                    await self.set_telegram_import_status(0, message)
-                    return 0
-                grouped_posts = {}
-                for item in payload.get("result", []):
-                    post = item.get("channel_post") or {}
-                    channel_id = str(post.get("chat", {}).get("id", ""))
-                    if channel_id != str(settings.TELEGRAM_CHANNEL_ID):
-                        continue
-                    message_id = str(post.get("message_id", ""))
-                    text = post.get("text") or post.get("caption") or ""
-                    if not message_id:
-                        continue
-                    group_id = post.get("media_group_id")
-                    import_key = f"media-group-{group_id}" if group_id else message_id
-                    entry = grouped_posts.setdefault(import_key, {
-                        "message_id": import_key,
-                        "slug_id": str(group_id or message_id),
-                        "text": "",
-                        "date": post.get("date", datetime.now().timestamp()),
-                        "photos": [],
-                    })
-                    if text and not entry["text"]:
-                        entry["text"] = text
-                    if post.get("date"):
-                        entry["date"] = min(entry["date"], post["date"])
-                    if post.get("photo"):
-                        entry["photos"].append(post["photo"][-1]["file_id"])
-
-                for post_data in grouped_posts.values():
-                    message_id = post_data["message_id"]
-                    parsed = parse_telegram_blog_text(post_data["text"])
-                    text = parsed["text"]
-                    has_title = bool(parsed["title"])
-                    is_full_article = has_title and len(plain_excerpt(text, 1000)) >= 300
-                    if not text and not post_data["photos"]:
-                        continue
-                    exists = await self.fetch_one("SELECT id FROM blog_posts WHERE telegram_message_id = ?", (message_id,))
-                    if exists:
-                        continue
-                    post_id = await self.save_blog_post({
-                        "telegram_message_id": message_id,
-                        "title": parsed["title"] or BLOG_DRAFT_TITLE,
-                        "slug": f"telegram-{post_data['slug_id']}" if not parsed["title"] else slugify(parsed["title"]),
-                        "category": parsed["category"],
-                        "excerpt": plain_excerpt(text, 180),
-                        "text_markdown": text,
-                        "created_at": datetime.fromtimestamp(post_data["date"]).strftime("%Y-%m-%d %H:%M:%S"),
-                        "status": "published" if is_full_article else "draft",
-                        "is_visible": "on" if is_full_article else "",
-                        "is_indexable": "on" if is_full_article else "",
-                    })
-                    first_image = None
-                    for index, file_id in enumerate(post_data["photos"], start=1):
-                        image_path = await self.save_telegram_photo(client, file_id, message_id, index)
-                        if image_path:
-                            if first_image is None:
-                                first_image = image_path
-                            await self.add_blog_photo(post_id, image_path, "Фото из Telegram", index)
-                    if first_image:
-                        await self.execute("""
-                            UPDATE blog_posts
-                            SET first_image = ?,
-                                cover_image = COALESCE(NULLIF(cover_image, ''), ?),
-                                cover_alt = CASE WHEN cover_alt = '' THEN title ELSE cover_alt END
-                            WHERE id = ?
-                        """, (first_image, first_image, post_id))
-                    imported += 1
-            await self.set_telegram_import_status(imported, "" if imported else "Новых channel_post в getUpdates не найдено. Bot API не отдаёт старую историю канала.")
+            async with httpx.AsyncClient(timeout=30.0 + poll_timeout) as client:
+                # offset читается из базы, а не из кэша настроек: его мог продвинуть прошлый владелец аренды
+                row = await self.fetch_one("SELECT value FROM settings WHERE key = 'telegram_import_offset'")
+                offset = int((row or {}).get("value") or 0)
+                while True:
+                    if not await renew_lease():
+                        logger.warning("Аренду импорта Telegram перехватил другой процесс, импорт остановлен")
+                        return imported, "skipped"
+                    params = {
+                        "allowed_updates": json.dumps(["channel_post"]),
+                        "limit": TELEGRAM_UPDATES_LIMIT,
+                        "timeout": poll_timeout,
+                    }
+                    if offset:
+                        params["offset"] = offset
+                    response = await client.get(url, params=params)
+                    if response.status_code != 200:
+                        detail = response.text[:300]
+                        message = f"Telegram Bot API вернул {response.status_code}: {detail}"
+                        logger.warning("Telegram import failed without exposing token: %s", message)
+                        await self.set_telegram_import_status(imported, message)
+                        return imported, "error"
+                    payload = response.json()
+                    if not payload.get("ok"):
+                        message = f"Telegram Bot API error: {payload.get('description', 'unknown error')}"
+                        logger.warning(message)
+                        await self.set_telegram_import_status(imported, message)
+                        return imported, "error"
+                    updates = payload.get("result", [])
+                    if not updates:
+                        break
+                    received += len(updates)
+                    imported += await self.import_channel_posts(client, updates)
+                    # Следующий getUpdates с этим offset подтверждает Telegram, что пачка обработана
+                    offset = max(int(item.get("update_id", 0)) for item in updates) + 1
+                    await self.update_settings({"telegram_import_offset": str(offset)})
+                    if len(updates) < TELEGRAM_UPDATES_LIMIT:
+                        break
+                    poll_timeout = 0
+            if received or not poll_timeout:
+                await self.set_telegram_import_status(imported, "" if imported else "Новых channel_post в getUpdates не найдено. Bot API не отдаёт старую историю канала.")
         except Exception as exc:
             message = f"{type(exc).__name__}: {str(exc)[:300]}"
             logger.error("Telegram import exception without token: %s", message)
-            await self.set_telegram_import_status(0, message)
+            await self.set_telegram_import_status(imported, message)
+            return imported, "error"
+        return imported, "ok"
+
+    async def import_channel_posts(self, client: httpx.AsyncClient, updates: list[dict]) -> int:
+        """Сохраняет channel_post из пачки getUpdates как посты блога и возвращает число новых постов"""
+        grouped_posts = {}
+        for item in updates:
+            post = item.get("channel_post") or {}
+            channel_id = str(post.get("chat", {}).get("id", ""))
+            if channel_id != str(settings.TELEGRAM_CHANNEL_ID):
+                continue
+            message_id = str(post.get("message_id", ""))
+            text = post.get("text") or post.get("caption") or ""
+            if not message_id:
+                continue
+            group_id = post.get("media_group_id")
+            import_key = f"media-group-{group_id}" if group_id else message_id
+            entry = grouped_posts.setdefault(import_key, {
+                "message_id": import_key,
+                "slug_id": str(group_id or message_id),
+                "text": "",
+                "date": post.get("date", datetime.now().timestamp()),
+                "photos": [],
+            })
+            if text and not entry["text"]:
+                entry["text"] = text
+            if post.get("date"):
+                entry["date"] = min(entry["date"], post["date"])
+            if post.get("photo"):
+                entry["photos"].append((message_id, post["photo"][-1]["file_id"]))
+        if not grouped_posts:
             return 0
+
+        keys = list(grouped_posts)
+        placeholders = ", ".join("?" for _ in keys)
+        existing_rows = await self.fetch_all(f"""
+            SELECT id, telegram_message_id, photo_count
+            FROM blog_posts
+            WHERE telegram_message_id IN ({placeholders})
+        """, tuple(keys))
+        existing = {row["telegram_message_id"]: row for row in existing_rows}
+        # Пачка может прийти повторно (offset не успел сохраниться): уже сохраненные фото не скачиваются
+        photo_keys = [photo_key for post_data in grouped_posts.values() for photo_key, _ in post_data["photos"]]
+        stored_photo_keys = set()
+        if photo_keys:
+            placeholders = ", ".join("?" for _ in photo_keys)
+            stored_rows = await self.fetch_all(f"""
+                SELECT telegram_message_id FROM blog_photos WHERE telegram_message_id IN ({placeholders})
+            """, tuple(photo_keys))
+            stored_photo_keys = {row["telegram_message_id"] for row in stored_rows}
+
+        new_posts = []
+        continued_groups = []
+        for post_data in grouped_posts.values():
+            post_data["parsed"] = parse_telegram_blog_text(post_data["text"])
+            post_data["photos"] = [photo for photo in post_data["photos"] if photo[0] not in stored_photo_keys]
+            known = existing.get(post_data["message_id"])
+            if known:
+                # Медиагруппа могла прийти частями в разных пачках: досохраняем фото к уже созданному посту
+                if post_data["photos"] and post_data["message_id"].startswith("media-group-"):
+                    post_data["post_id"] = known["id"]
+                    post_data["photo_offset"] = known["photo_count"]
+                    continued_groups.append(post_data)
+                continue
+            if not post_data["parsed"]["text"] and not post_data["photos"]:
+                continue
+            post_data["photo_offset"] = 0
+            new_posts.append(post_data)
+
+        # Все фото пачки скачиваются параллельно
+        downloader = TelegramMediaDownloader(
+            client,
+            per_host=settings.TELEGRAM_DOWNLOAD_CONCURRENCY,
+            retries=settings.TELEGRAM_DOWNLOAD_RETRIES,
+        )
+        download_started = time.perf_counter()
+        photo_jobs = [
+            (photo_key, file_id, post_data["message_id"], post_data["photo_offset"] + index)
+            for post_data in new_posts + continued_groups
+            for index, (photo_key, file_id) in enumerate(post_data["photos"], start=1)
+        ]
+        downloads = await downloader.download_many([job[1:] for job in photo_jobs])
+        if downloads:
+            logger.info(
+                f"Telegram: скачано фото {sum(1 for item in downloads if item['path'])} из {len(downloads)} "
+                f"за {time.perf_counter() - download_started:.2f} с"
+            )
+        photos_by_post = {}
+        for (photo_key, *_), item in zip(photo_jobs, downloads):
+            item["telegram_message_id"] = photo_key
+            photos_by_post.setdefault(item["message_key"], []).append(item)
+
+        imported = 0
+        for post_data in new_posts + continued_groups:
+            message_id = post_data["message_id"]
+            post_id = post_data.get("post_id")
+            if post_id is None:
+                parsed = post_data["parsed"]
+                text = parsed["text"]
+                has_title = bool(parsed["title"])
+                is_full_article = has_title and len(plain_excerpt(text, 1000)) >= 300
+                post_id = await self.save_blog_post({
+                    "telegram_message_id": message_id,
+                    "title": parsed["title"] or BLOG_DRAFT_TITLE,
+                    "slug": f"telegram-{post_data['slug_id']}" if not parsed["title"] else slugify(parsed["title"]),
+                    "category": parsed["category"],
+                    "excerpt": plain_excerpt(text, 180),
+                    "text_markdown": text,
+                    "created_at": datetime.fromtimestamp(post_data["date"]).strftime("%Y-%m-%d %H:%M:%S"),
+                    "status": "published" if is_full_article else "draft",
+                    "is_visible": "on" if is_full_article else "",
+                    "is_indexable": "on" if is_full_article else "",
+                })
+                imported += 1
+            first_image = None
+            saved_images = []
+            for item in photos_by_post.get(message_id, []):
+                image_path = item["path"]
+                if not image_path:
+                    continue
+                added = await self.add_blog_photo(
+                    post_id, image_path, "Фото из Telegram", item["sort_order"], item["telegram_message_id"],
+                )
+                if not added:
+                    # Фото уже сохранил параллельный импорт той же пачки: лишний файл не нужен
+                    duplicate = Path(image_path.lstrip("/"))
+                    if duplicate.exists():
+                        await aiofiles.os.remove(duplicate)
+                    static_assets.discard(image_path)
+                    continue
+                if first_image is None:
+                    first_image = image_path
+                saved_images.append(image_path)
+            if saved_images:
+                await self.create_image_variants(saved_images)
+            if first_image:
+                await self.execute("""
+                    UPDATE blog_posts
+                    SET first_image = COALESCE(NULLIF(first_image, ''), ?),
+                        cover_image = COALESCE(NULLIF(cover_image, ''), ?),
+                        cover_alt = CASE WHEN cover_alt = '' THEN title ELSE cover_alt END
+                    WHERE id = ?
+                """, (first_image, first_image, post_id))
+                await self.touch_cache("blog")
         return imported
 
 # ========== СЕРВИС TELEGRAM УВЕДОМЛЕНИЙ ==========
+class TokenBucket:
+    """Асинхронный token bucket: не больше rate операций в секунду с запасом capacity"""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
 class TelegramService:
     """Класс для отправки уведомлений в Telegram"""
+    # Telegram допускает около 30 сообщений в секунду на бота и около одного в секунду в один чат
+    CHAT_RATE = 1.0
+    CHAT_BURST = 3
+
     def __init__(self):
         self.bot_token = settings.TELEGRAM_BOT_TOKEN
         self.admin_id = settings.ADMIN_TELEGRAM_ID
         self.staff_ids = [id.strip() for id in settings.STAFF_TELEGRAM_IDS if id.strip()]
+        self.send_timeout = settings.TELEGRAM_SEND_TIMEOUT
+        self._client: Optional[httpx.AsyncClient] = None
+        self._bot_limit = TokenBucket(settings.TELEGRAM_SEND_RATE, settings.TELEGRAM_SEND_RATE)
+        self._chat_limits: dict[str, TokenBucket] = {}
         logger.info(f"Инициализирован TelegramService: admin_id={self.admin_id}, staff_count={len(self.staff_ids)}")
 
-    async def send_booking_notification(self, booking: dict):
-        """Отправка уведомления о новой заявке в Telegram"""
-        logger.info(f"Начало отправки уведомления в Telegram для заявки {booking.get('id')}")
-
+    @property
+    def recipients(self) -> list[str]:
+        """Администратор и сотрудники без повторов; без токена бота уведомлять некого"""
         if not self.bot_token:
-            logger.warning("TELEGRAM_BOT_TOKEN не настроен - пропускаем отправку в Telegram")
-            return
+            return []
+        return list(dict.fromkeys(chat_id for chat_id in [self.admin_id, *self.staff_ids] if chat_id))
+
+    def get_client(self) -> httpx.AsyncClient:
+        """Общий keep-alive клиент на всё время работы приложения"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.send_timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
 
-        # Формируем сообщение для Telegram
-        message = f"""
-Новая заявка на TinaBorke.Art
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
-Имя: {booking['name']}
-Телефон: {booking['phone']}
-Услуга: {booking.get('service', 'Не указана')}
-Дата: {booking.get('date', 'Не указана')}
-Сообщение: {booking.get('message', 'Не указано')}
-
-Время заявки: {booking.get('created_at', 'Не указано')} (МСК)
-ID заявки: {booking['id']}
-        """
+    def _chat_limit(self, chat_id: str) -> TokenBucket:
+        if chat_id not in self._chat_limits:
+            self._chat_limits[chat_id] = TokenBucket(self.CHAT_RATE, self.CHAT_BURST)
+        return self._chat_limits[chat_id]
 
+    async def _deliver(self, chat_id: str, payload: dict) -> httpx.Response:
         url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-        logger.info(f"URL для отправки в Telegram: {url.split('/bot')[0]}/bot***")
+        await self._chat_limit(chat_id).acquire()
+        await self._bot_limit.acquire()
+        response = await self.get_client().post(url, json=payload)
+        if response.status_code == 429:
+            # Telegram сообщает, сколько подождать, в parameters.retry_after
+            retry_after = (response.json().get("parameters") or {}).get("retry_after", 1)
+            await asyncio.sleep(float(retry_after))
+            response = await self.get_client().post(url, json=payload)
+        return response
+
+    async def deliver(self, chat_id: str, text: str) -> tuple[bool, str, bool]:
+        """Отправляет одно сообщение и возвращает (успех, ошибка, ошибка_постоянная)"""
+        started = time.perf_counter()
+        result = await self._deliver_once(chat_id, text)
+        TELEGRAM_NOTIFICATION_DURATION.labels("sent" if result[0] else "failed").observe(time.perf_counter() - started)
+        return result
 
+    async def _deliver_once(self, chat_id: str, text: str) -> tuple[bool, str, bool]:
+        if not self.bot_token:
+            return False, "TELEGRAM_BOT_TOKEN не настроен", False
+        # Без parse_mode: в тексте есть имя и сообщение клиента, а символы _ * ` [ в Markdown ломают разбор
+        payload = {'chat_id': chat_id, 'text': text}
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                sent_count = 0
-
-                # Отправляем администратору
-                if self.admin_id:
-                    logger.info(f"Отправка уведомления администратору: {self.admin_id}")
-                    try:
-                        response = await client.post(url, json={
-                            'chat_id': self.admin_id,
-                            'text': message,
-                            'parse_mode': 'Markdown'
-                        })
-                        if response.status_code == 200:
-                            logger.info(f"Уведомление успешно отправлено администратору")
-                            sent_count += 1
-                        else:
-                            logger.error(f"Ошибка отправки администратору: {response.status_code} - {response.text}")
-                    except Exception as e:
-                        logger.error(f"Исключение при отправке администратору: {e}")
-
-                # Отправляем сотрудникам
-                for staff_id in self.staff_ids:
-                    if staff_id and staff_id != self.admin_id:
-                        logger.info(f"Отправка уведомления сотруднику: {staff_id}")
-                        try:
-                            response = await client.post(url, json={
-                                'chat_id': staff_id,
-                                'text': message,
-                                'parse_mode': 'Markdown'
-                            })
-                            if response.status_code == 200:
-                                logger.info(f"Уведомление успешно отправлено сотруднику {staff_id}")
-                                sent_count += 1
-                            else:
-                                logger.error(f"Ошибка отправки сотруднику {staff_id}: {response.status_code} - {response.text}")
-                        except Exception as e:
-                            logger.error(f"Исключение при отправке сотруднику {staff_id}: {e}")
-
-            logger.info(f"Процесс отправки уведомлений завершен. Отправлено: {sent_count}")
-
+            response = await asyncio.wait_for(self._deliver(chat_id, payload), self.send_timeout)
+        except asyncio.TimeoutError:
+            return False, f"Таймаут отправки ({self.send_timeout} с)", False
         except Exception as e:
-            logger.error(f"Критическая ошибка отправки уведомлений в Telegram: {e}")
+            return False, f"{type(e).__name__}: {e}", False
+        if response.status_code != 200:
+            # 403 — бот заблокирован, 400 "chat not found" — неверный chat_id: повтор не поможет.
+            # Остальные ошибки повторяются и уходят в dead-letter только после OUTBOX_MAX_ATTEMPTS попыток
+            permanent = response.status_code == 403 or (
+                response.status_code == 400 and "chat not found" in response.text.lower()
+            )
+            return False, f"{response.status_code} - {response.text[:300]}", permanent
+        return True, "", False
+
+
+class NotificationOutboxWorker:
+    """Фоновая отправка уведомлений из notification_outbox с повторами и dead-letter"""
+    def __init__(self, database: "Database", sender: TelegramService):
+        self.db = database
+        self.sender = sender
+        self.batch_size = max(1, settings.OUTBOX_BATCH_SIZE)
+        self.max_attempts = max(1, settings.OUTBOX_MAX_ATTEMPTS)
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def wake(self):
+        """Будит воркер сразу после новой заявки, не дожидаясь OUTBOX_POLL_INTERVAL"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def retry_delay(self, attempts: int) -> float:
+        return min(settings.OUTBOX_RETRY_BASE * (2 ** (attempts - 1)), settings.OUTBOX_RETRY_MAX)
+
+    async def drain_once(self) -> int:
+        """Отправляет одну пачку уведомлений и возвращает её размер"""
+        # Пока пачка в работе, другие воркеры её не берут; после падения процесса она вернётся в очередь
+        lease = self.sender.send_timeout * 2 + 30
+        batch = await self.db.claim_outbox_batch(self.batch_size, lease)
+        if not batch:
+            return 0
+        results = await asyncio.gather(*(self.sender.deliver(item["chat_id"], item["text"]) for item in batch))
+        sent_ids = []
+        failures = []
+        now = time.time()
+        for item, (ok, error, permanent) in zip(batch, results):
+            if ok:
+                sent_ids.append(item["id"])
+                continue
+            dead = permanent or item["attempts"] >= self.max_attempts
+            TELEGRAM_NOTIFICATIONS.labels("dead" if dead else "retry").inc()
+            failures.append((item["id"], now + self.retry_delay(item["attempts"]), error, dead))
+            if dead:
+                logger.error(f"Уведомление {item['id']} по заявке {item['booking_id']} для {item['chat_id']} не доставлено и перенесено в dead-letter: {error}")
+            else:
+                logger.warning(f"Уведомление {item['id']} для {item['chat_id']} не отправлено (попытка {item['attempts']}): {error}")
+        await self.db.finish_outbox_batch(sent_ids, failures)
+        TELEGRAM_NOTIFICATIONS.labels("sent").inc(len(sent_ids))
+        if sent_ids:
+            logger.info(f"Отправлено уведомлений из outbox: {len(sent_ids)} из {len(batch)}")
+        return len(batch)
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                if await self.drain_once() >= self.batch_size:
+                    continue
+            except Exception as e:
+                logger.error(f"Ошибка обработки outbox уведомлений: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
 
 # ========== ИНИЦИАЛИЗАЦИЯ СЕРВИСОВ ==========
 logger.info("Инициализация сервисов...")
-db = Database()
+db = Database(DATABASE_PATH)
 telegram_service = TelegramService()
+notification_worker = NotificationOutboxWorker(db, telegram_service)
+notification_task = None
 telegram_import_task = None
+static_index_task = None
 logger.info("Сервисы инициализированы")
 
 # ========== СОЗДАНИЕ ДИРЕКТОРИЙ ==========
@@ -1707,6 +3104,7 @@ directories = ["static", "static/css", "static/js", "static/images", "static/upl
 for directory in directories:
     Path(directory).mkdir(exist_ok=True)
     logger.info(f"Директория {directory} создана/проверена")
+Path(DATABASE_PATH).parent.mkdir(parents=True, exist_ok=True)
 
 # ========== LIFECYCLE МЕНЕДЖЕР FASTAPI ==========
 @asynccontextmanager
@@ -1722,18 +3120,44 @@ async def lifespan(app: FastAPI):
         logger.error(f"[ERROR] Ошибка инициализации базы данных: {e}")
         raise
 
+    await static_assets.refresh()
+    logger.info(f"[OK] Индекс статических файлов построен: {len(static_assets)} файлов")
+
+    async def static_index_loop():
+        while True:
+            await asyncio.sleep(settings.STATIC_INDEX_REFRESH_INTERVAL)
+            try:
+                if await static_assets.refresh():
+                    logger.info(f"Индекс статических файлов обновлен: {len(static_assets)} файлов")
+            except Exception as e:
+                logger.warning(f"Обновление индекса статических файлов пропущено: {e}")
+
     async def telegram_import_loop():
+        long_poll = settings.TELEGRAM_LONG_POLL_TIMEOUT > 0
         while True:
+            imported = 0
             try:
-                await db.import_telegram_updates()
+                imported = await db.import_telegram_updates(poll_timeout=settings.TELEGRAM_LONG_POLL_TIMEOUT)
             except Exception as e:
                 logger.warning(f"Автоимпорт Telegram пропущен: {e}")
-            await asyncio.sleep(600)
-
-    global telegram_import_task
+            if imported is None:
+                # getUpdates сейчас выполняет другой воркер: ждем, пока аренда освободится или истечет
+                await asyncio.sleep(TELEGRAM_IMPORT_STANDBY_INTERVAL if long_poll else settings.TELEGRAM_IMPORT_INTERVAL)
+                continue
+            # В режиме long polling ожидание происходит внутри getUpdates, пауза нужна только как защита от частых ошибок
+            await asyncio.sleep(1 if long_poll else settings.TELEGRAM_IMPORT_INTERVAL)
+
+    global telegram_import_task, notification_task, static_index_task
+    notification_task = asyncio.create_task(notification_worker.run())
+    if settings.STATIC_INDEX_REFRESH_INTERVAL > 0:
+        static_index_task = asyncio.create_task(static_index_loop())
+    logger.info("[OK] Воркер отправки уведомлений из outbox запущен")
     if settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_CHANNEL_ID:
         telegram_import_task = asyncio.create_task(telegram_import_loop())
-        logger.info("[OK] Автоимпорт Telegram запущен с интервалом 10 минут")
+        if settings.TELEGRAM_LONG_POLL_TIMEOUT > 0:
+            logger.info(f"[OK] Автоимпорт Telegram запущен в режиме long polling ({settings.TELEGRAM_LONG_POLL_TIMEOUT} с)")
+        else:
+            logger.info(f"[OK] Автоимпорт Telegram запущен с интервалом {settings.TELEGRAM_IMPORT_INTERVAL} с")
     else:
         logger.info("Автоимпорт Telegram не запущен: задайте TELEGRAM_BOT_TOKEN и TELEGRAM_CHANNEL_ID")
 
@@ -1742,6 +3166,14 @@ async def lifespan(app: FastAPI):
     # Shutdown логика
     if telegram_import_task:
         telegram_import_task.cancel()
+    if notification_task:
+        notification_task.cancel()
+    if static_index_task:
+        static_index_task.cancel()
+    if image_executor is not None:
+        image_executor.shutdown(wait=False, cancel_futures=True)
+    await telegram_service.close()
+    await db.close()
     logger.info("<<< Остановка приложения TinaBorke.Art")
 
 # ========== СОЗДАНИЕ FASTAPI ПРИЛОЖЕНИЯ ==========
@@ -1764,6 +3196,30 @@ app.add_middleware(
 )
 logger.info("CORS middleware добавлен")
 
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    """Метрики Prometheus, заголовок Server-Timing и журнал медленных запросов"""
+    started = time.perf_counter()
+    timings = RequestTimings()
+    request_timings.set(timings)
+    status = 500
+    response = None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        # Метка — шаблон маршрута (/blog/{slug}), а не конкретный URL, чтобы не раздувать число рядов
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", None) or "unmatched"
+        HTTP_REQUEST_DURATION.labels(request.method, route_path, str(status)).observe(elapsed)
+        header = server_timing_header(timings, elapsed)
+        if response is not None:
+            response.headers["Server-Timing"] = header
+        if settings.SLOW_REQUEST_MS and elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+            logger.warning(f"Медленный запрос {request.method} {request.url.path} ({route_path}) -> {status}: {header}")
+
 @app.middleware("http")
 async def add_cache_headers(request: Request, call_next):
     response = await call_next(request)
@@ -1781,8 +3237,14 @@ else:
     logger.warning("[WARN] Директория static не найдена")
 
 # ========== ШАБЛОНЫ JINJA2 ==========
+class TimedJinja2Templates(Jinja2Templates):
+    """Jinja2Templates, которые учитывают время рендеринга в фазе template"""
+    def TemplateResponse(self, *args, **kwargs):
+        with timed_phase("template"):
+            return super().TemplateResponse(*args, **kwargs)
+
 if Path("templates").exists():
-    templates = Jinja2Templates(directory="templates")
+    templates = TimedJinja2Templates(directory="templates")
     templates.env.filters["ru_datetime"] = format_ru_datetime
     logger.info("Шаблоны Jinja2 инициализированы")
 else:
@@ -1798,24 +3260,151 @@ async def save_upload(file: UploadFile, directory: str) -> str:
     target_dir = Path(directory)
     target_dir.mkdir(parents=True, exist_ok=True)
     target = target_dir / safe_name
-    content = await file.read()
-    if len(content) > 8 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="Файл слишком большой")
-    target.write_bytes(content)
+    # Копируем частями во временный файл и переименовываем только целиком записанный файл
+    temp_target = target_dir / f".{safe_name}.part"
+    size = 0
+    try:
+        async with aiofiles.open(temp_target, "wb") as output:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_IMAGE_BYTES:
+                    raise HTTPException(status_code=400, detail="Файл слишком большой")
+                await output.write(chunk)
+        await aiofiles.os.replace(temp_target, target)
+        static_assets.add(str(target))
+        UPLOAD_SIZE_BYTES.observe(size)
+    except BaseException:
+        try:
+            await aiofiles.os.remove(temp_target)
+        except FileNotFoundError:
+            pass
+        raise
     return "/" + str(target).replace("\\", "/")
 
+# ========== КЭШ HTML-СТРАНИЦ ==========
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """Проверяет If-None-Match, а при его отсутствии If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {item.strip().removeprefix("W/") for item in if_none_match.split(",")}
+        return "*" in candidates or etag in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= int(since)
+    return False
+
+# Рекламные метки не меняют страницу: адреса с ними и без них делят одну запись кэша (плюс все utm_*)
+TRACKING_QUERY_PARAMS = {"gclid", "yclid", "fbclid"}
+
+class PageCache:
+    """LRU-кэш отрендеренных публичных страниц с версиями зависимых данных и HTTP-валидаторами.
+
+    Тег "today" зависит не от данных, а от текущей даты по Москве (нужен sitemap с lastmod).
+    """
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(request: Request) -> tuple:
+        """Хост, путь и параметры запроса без рекламных меток, отсортированные по имени"""
+        params = [
+            (name, value) for name, value in parse_qsl(request.url.query, keep_blank_values=True)
+            if not name.startswith("utm_") and name not in TRACKING_QUERY_PARAMS
+        ]
+        params.sort(key=lambda item: item[0])
+        return (get_base_url(request), request.url.path, urlencode(params))
+
+    @staticmethod
+    def validator_headers(entry: dict, cache_status: str) -> dict:
+        return {
+            "ETag": entry["etag"],
+            "Last-Modified": formatdate(entry["last_modified"], usegmt=True),
+            "Cache-Control": "no-cache",
+            "X-Page-Cache": cache_status,
+        }
+
+    async def serve(self, request: Request, tags: tuple, render):
+        key = self.make_key(request)
+        versions = await db.get_cache_versions()
+        stamp = tuple(
+            get_moscow_time().strftime("%Y-%m-%d") if tag == "today" else versions.get(tag, 0)
+            for tag in tags
+        )
+        entry = self._entries.get(key)
+        if entry is not None and entry["stamp"] == stamp:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            PAGE_CACHE_REQUESTS.labels("hit").inc()
+            headers = self.validator_headers(entry, "HIT")
+            if is_not_modified(request, entry["etag"], entry["last_modified"]):
+                return Response(status_code=304, headers=headers)
+            return Response(entry["body"], media_type=entry["media_type"], headers=headers)
+        self.misses += 1
+        PAGE_CACHE_REQUESTS.labels("miss").inc()
+        response = await render()
+        body = getattr(response, "body", None)
+        if response.status_code != 200 or body is None:
+            self._entries.pop(key, None)
+            return response
+        etag = make_etag(body)
+        # Если после сброса версии HTML не изменился, Last-Modified остается прежним
+        last_modified = entry["last_modified"] if entry is not None and entry["etag"] == etag else time.time()
+        entry = {
+            "body": body,
+            "media_type": response.media_type,
+            "stamp": stamp,
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        headers = self.validator_headers(entry, "MISS")
+        if is_not_modified(request, etag, last_modified):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return response
+
+    def clear(self):
+        self._entries.clear()
+
+page_cache = PageCache(settings.PAGE_CACHE_MAX_ENTRIES)
+
+def cached_page(*tags: str):
+    """Кэширует HTML публичного обработчика, пока не изменятся данные из tags"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            return await page_cache.serve(kwargs["request"], tags, lambda: handler(*args, **kwargs))
+        return wrapper
+    return decorator
+
 # ========== МАРШРУТЫ API ==========
 @app.get("/", response_class=HTMLResponse)
+@cached_page("settings", "services", "reviews", "portfolio", "images")
 async def read_root(request: Request):
     """Главная страница сайта"""
-    logger.info("Запрос главной страницы")
     if Path("templates").exists():
-        logger.info("Рендеринг index.html из templates")
-        site_settings = await db.get_settings()
-        service_groups = await db.get_services_by_group()
+        # Запросы страницы независимы и выполняются параллельно на соединениях пула
+        site_settings, service_groups, reviews, portfolio_photos, image_variants = await asyncio.gather(
+            db.get_settings(),
+            db.get_services_by_group(),
+            db.get_reviews(global_only=True),
+            db.get_portfolio_photos(active_only=True, limit=6),
+            db.get_image_variants(),
+        )
         services = service_groups["all_services"]
-        reviews = await db.get_reviews(global_only=True)
-        portfolio_photos = await db.get_portfolio_photos(active_only=True, limit=6)
         social_links = get_social_links(site_settings)
         canonical_url = absolute_url("/", request)
         seo_title = truncate_meta(
@@ -1859,6 +3448,7 @@ async def read_root(request: Request):
             "main_services": service_groups["main_services"],
             "additional_services": service_groups["additional_services"],
             "portfolio_photos": portfolio_photos,
+            "image_variants": image_variants,
             "reviews": reviews,
             "social_links": social_links,
             "canonical_url": canonical_url,
@@ -1871,7 +3461,7 @@ async def read_root(request: Request):
             "json_ld": json_ld_dump(json_ld),
         })
     else:
-        logger.info("Отдача fallback HTML (шаблоны не найдены)")
+        logger.warning("Отдача fallback HTML (шаблоны не найдены)")
         return HTMLResponse("""
         <!DOCTYPE html>
         <html>
@@ -1887,6 +3477,7 @@ async def read_root(request: Request):
         """)
 
 @app.get("/about", response_class=HTMLResponse)
+@cached_page("settings")
 async def about_page(request: Request):
     site_settings = await db.get_settings()
     canonical_url = absolute_url("/about", request)
@@ -1913,17 +3504,27 @@ async def about_page(request: Request):
     })
 
 @app.get("/blog", response_class=HTMLResponse)
-async def blog_index(request: Request, category: Optional[str] = None):
-    site_settings = await db.get_settings()
-    posts = await db.get_blog_posts()
-    blog_categories = await db.get_blog_categories()
+@cached_page("settings", "blog", "images")
+async def blog_index(request: Request, category: Optional[str] = None, after: Optional[str] = None, before: Optional[str] = None):
+    site_settings, blog_categories, image_variants = await asyncio.gather(
+        db.get_settings(),
+        db.get_blog_categories(),
+        db.get_image_variants(),
+    )
     active_category = ""
     if category:
         category_map = {item["slug"]: item["title"] for item in blog_categories}
         active_category = category_map.get(category, "")
-        if active_category:
-            posts = [post for post in posts if post.get("category") == active_category]
-    canonical_url = absolute_url("/blog", request)
+    category_param = category if active_category else ""
+    page = await db.get_blog_posts_page(active_category, after, before, max(1, settings.BLOG_PAGE_SIZE))
+    posts = page["items"]
+    prev_url = page_link("/blog", category=category_param, before=page["prev_cursor"]) if page["prev_cursor"] else ""
+    next_url = page_link("/blog", category=category_param, after=page["next_cursor"]) if page["next_cursor"] else ""
+    # Первая страница канонизируется на /blog, страницы по курсору ссылаются сами на себя
+    if after or before:
+        canonical_url = absolute_url(page_link("/blog", category=category_param, after=after, before=before), request)
+    else:
+        canonical_url = absolute_url("/blog", request)
     seo_title = "Советы по макияжу и образы — визажист Тина Борке"
     seo_description = "Полезные советы по макияжу, свадебным образам, фотосессиям и подготовке к важным событиям от визажиста Тины Борке в Санкт-Петербурге."
     og_image = ""
@@ -1934,8 +3535,11 @@ async def blog_index(request: Request, category: Optional[str] = None):
         "site_settings": site_settings,
         "social_links": get_social_links(site_settings),
         "posts": posts,
+        "image_variants": image_variants,
         "blog_categories": blog_categories,
         "active_category": active_category,
+        "prev_url": absolute_url(prev_url, request) if prev_url else "",
+        "next_url": absolute_url(next_url, request) if next_url else "",
         "canonical_url": canonical_url,
         "seo_title": seo_title,
         "seo_description": seo_description,
@@ -1946,9 +3550,13 @@ async def blog_index(request: Request, category: Optional[str] = None):
     })
 
 @app.get("/blog/{slug}", response_class=HTMLResponse)
+@cached_page("settings", "blog", "services", "images")
 async def blog_post(request: Request, slug: str):
-    site_settings = await db.get_settings()
-    post = await db.get_blog_post(slug)
+    site_settings, post, image_variants = await asyncio.gather(
+        db.get_settings(),
+        db.get_blog_post(slug),
+        db.get_image_variants(),
+    )
     if not post:
         raise HTTPException(status_code=404, detail="Пост не найден")
     canonical_url = absolute_url(f"/blog/{slug}", request)
@@ -1981,6 +3589,7 @@ async def blog_post(request: Request, slug: str):
         "site_settings": site_settings,
         "social_links": get_social_links(site_settings),
         "post": post,
+        "image_variants": image_variants,
         "canonical_url": canonical_url,
         "seo_title": seo_title,
         "seo_description": seo_description,
@@ -1993,10 +3602,13 @@ async def blog_post(request: Request, slug: str):
     })
 
 @app.get("/portfolio", response_class=HTMLResponse)
+@cached_page("settings", "portfolio")
 async def portfolio_index(request: Request):
-    site_settings = await db.get_settings()
-    categories = await db.get_portfolio_categories()
-    photos = await db.get_portfolio_photos(active_only=True, limit=20)
+    site_settings, categories, photos = await asyncio.gather(
+        db.get_settings(),
+        db.get_portfolio_categories(),
+        db.get_portfolio_photos(active_only=True, limit=20),
+    )
     canonical_url = absolute_url("/portfolio", request)
     seo_title = truncate_meta(f"Портфолио визажиста {site_settings.get('master_name_genitive', 'Тины Борке')} — макияж и грим в Санкт-Петербурге", 70)
     seo_description = truncate_meta(f"Портфолио визажиста {site_settings.get('master_name_genitive', 'Тины Борке')}: свадебный, вечерний, лифтинг макияж и образы для мероприятий.", 160)
@@ -2017,15 +3629,23 @@ async def portfolio_index(request: Request):
     })
 
 @app.get("/portfolio/{category_slug}", response_class=HTMLResponse)
-async def portfolio_category_page(request: Request, category_slug: str):
-    site_settings = await db.get_settings()
-    category = await db.get_portfolio_category(category_slug)
+@cached_page("settings", "portfolio", "services", "images")
+async def portfolio_category_page(request: Request, category_slug: str, after: Optional[str] = None, before: Optional[str] = None):
+    site_settings, category, image_variants = await asyncio.gather(
+        db.get_settings(),
+        db.get_portfolio_category(category_slug),
+        db.get_image_variants(),
+    )
     if not category:
         raise HTTPException(status_code=404, detail="Категория портфолио не найдена")
-    canonical_url = absolute_url(f"/portfolio/{category_slug}", request)
+    page = await db.get_portfolio_photos_page(category["id"], after, before, max(1, settings.PORTFOLIO_PAGE_SIZE))
+    photos = page["items"]
+    path = f"/portfolio/{category_slug}"
+    prev_url = page_link(path, before=page["prev_cursor"]) if page["prev_cursor"] else ""
+    next_url = page_link(path, after=page["next_cursor"]) if page["next_cursor"] else ""
+    canonical_url = absolute_url(page_link(path, after=after, before=before), request)
     seo_title = truncate_meta(f"{category['title']} — портфолио визажиста Тины Борке", 70)
     seo_description = truncate_meta(category.get("description"), 160, f"{category['title']} в портфолио визажиста Тины Борке в Санкт-Петербурге.")
-    photos = category.get("photos", [])
     image_graph = [image_object_ld(photo, photo.get("alt_text") or f"{category['title']} — работа визажиста Тины Борке", request) for photo in photos]
     breadcrumbs = build_breadcrumbs([
         {"name": "Главная", "url": "/"},
@@ -2037,6 +3657,11 @@ async def portfolio_category_page(request: Request, category_slug: str):
         "site_settings": site_settings,
         "social_links": get_social_links(site_settings),
         "category": category,
+        "photos": photos,
+        "image_variants": image_variants,
+        "prev_url": absolute_url(prev_url, request) if prev_url else "",
+        "next_url": absolute_url(next_url, request) if next_url else "",
+        "next_api_url": page_link(f"/api{path}/photos", after=page["next_cursor"]) if page["next_cursor"] else "",
         "canonical_url": canonical_url,
         "seo_title": seo_title,
         "seo_description": seo_description,
@@ -2047,13 +3672,52 @@ async def portfolio_category_page(request: Request, category_slug: str):
         "json_ld": json_ld_dump(json_ld_payload),
     })
 
+@app.get("/api/portfolio/{category_slug}/photos")
+@cached_page("settings", "portfolio", "images")
+async def portfolio_category_photos(request: Request, category_slug: str, after: Optional[str] = None, before: Optional[str] = None):
+    """Следующая порция фото раздела для бесконечной прокрутки"""
+    site_settings, category, image_variants = await asyncio.gather(
+        db.get_settings(),
+        db.get_portfolio_category(category_slug),
+        db.get_image_variants(),
+    )
+    if not category:
+        raise HTTPException(status_code=404, detail="Категория портфолио не найдена")
+    page = await db.get_portfolio_photos_page(category["id"], after, before, max(1, settings.PORTFOLIO_PAGE_SIZE))
+    default_alt = f"{category['title']} в Санкт-Петербурге — работа визажиста {site_settings.get('master_name_genitive', 'Тины Борке')}"
+    path = f"/portfolio/{category_slug}"
+    return JSONResponse({
+        "photos": [
+            {
+                "image_path": photo["image_path"],
+                "alt": photo.get("alt_text") or default_alt,
+                "srcset": image_variants.get(photo["image_path"], ""),
+            }
+            for photo in page["items"]
+        ],
+        "next_cursor": page["next_cursor"],
+        "next_url": page_link(path, after=page["next_cursor"]) if page["next_cursor"] else "",
+        "next_api_url": page_link(f"/api{path}/photos", after=page["next_cursor"]) if page["next_cursor"] else "",
+    })
+
 @app.get("/uslugi/{slug}", response_class=HTMLResponse)
+@cached_page("settings", "services", "reviews", "portfolio", "blog", "images")
 async def service_page(request: Request, slug: str):
-    site_settings = await db.get_settings()
-    service = await db.get_service_by_slug(slug)
+    site_settings, service, image_variants = await asyncio.gather(
+        db.get_settings(),
+        db.get_service_by_slug(slug),
+        db.get_image_variants(),
+    )
     if not service:
         raise HTTPException(status_code=404, detail="Услуга не найдена")
-    reviews = await db.get_reviews(service_id=service["id"])
+    # Все остальные запросы зависят только от service и выполняются параллельно
+    reviews, faq_items, portfolio_photos, related_services, related_posts = await asyncio.gather(
+        db.get_reviews(service_id=service["id"]),
+        db.get_service_faq(service["id"]),
+        db.get_service_portfolio_photos(service, limit=6),
+        db.get_related_services(service["id"], active_only=True),
+        db.get_related_posts(service["id"], visible_only=True),
+    )
     service_include_items = [
         line.strip(" -\t")
         for line in (service.get("service_includes") or "").splitlines()
@@ -2063,10 +3727,6 @@ async def service_page(request: Request, slug: str):
     seo_title = truncate_meta(service.get("seo_title"), 70, f"{service['title']} — Тина Борке, Санкт-Петербург")
     seo_description = truncate_meta(service.get("seo_description"), 160, service.get("description") or service["title"])
     canonical_url = absolute_url(f"/uslugi/{slug}", request)
-    faq_items = await db.get_service_faq(service["id"])
-    portfolio_photos = await db.get_service_portfolio_photos(service, limit=6)
-    related_services = await db.get_related_services(service["id"], active_only=True)
-    related_posts = await db.get_related_posts(service["id"], visible_only=True)
     preview_image_url = ""
     if portfolio_photos:
         preview_image_url = absolute_asset_url(portfolio_photos[0]["image_path"], request)
@@ -2127,6 +3787,7 @@ async def service_page(request: Request, slug: str):
             "service_include_items": service_include_items,
             "faq_items": faq_items,
             "portfolio_photos": portfolio_photos,
+            "image_variants": image_variants,
             "related_services": related_services,
             "related_posts": related_posts,
             "reviews": reviews,
@@ -2139,13 +3800,41 @@ async def service_page(request: Request, slug: str):
             "json_ld": json_ld_dump(json_ld_payload),
     })
 
+# Поиск не кэшируется в PageCache: запросы произвольные и вытесняли бы из кэша страницы сайта
+@app.get("/search", response_class=HTMLResponse)
+async def search_page(request: Request, q: str = ""):
+    query = q.strip()[:SEARCH_QUERY_MAX_LENGTH]
+    site_settings, results = await asyncio.gather(
+        db.get_settings(),
+        db.search(query, SEARCH_RESULTS_LIMIT),
+    )
+    seo_title = f"Поиск: {query}" if query else "Поиск по сайту"
+    seo_description = "Поиск по услугам, частым вопросам и публикациям визажиста Тины Борке."
+    return templates.TemplateResponse(request, "search.html", {
+        "site_settings": site_settings,
+        "social_links": get_social_links(site_settings),
+        "query": query,
+        "results": results,
+        "canonical_url": absolute_url("/search", request),
+        "seo_title": seo_title,
+        "seo_description": seo_description,
+    })
+
+@app.get("/api/search")
+async def search_api(q: str = "", limit: int = SEARCH_RESULTS_LIMIT):
+    query = q.strip()[:SEARCH_QUERY_MAX_LENGTH]
+    results = await db.search(query, max(1, min(limit, SEARCH_API_MAX_LIMIT)))
+    return {"query": query, "results": results}
+
 @app.get("/robots.txt", response_class=PlainTextResponse)
+@cached_page()
 async def robots_txt(request: Request):
-    return (
+    return PlainTextResponse(
         "User-agent: *\n"
         "Disallow: /admin\n"
         "Disallow: /login\n"
         "Disallow: /logout\n"
+        "Disallow: /search\n"
         "Allow: /\n\n"
         f"Sitemap: {absolute_url('/sitemap.xml', request)}\n"
     )
@@ -2155,10 +3844,13 @@ async def favicon_ico():
     return FileResponse("static/images/favicon.ico", media_type="image/x-icon")
 
 @app.get("/sitemap.xml", response_class=PlainTextResponse)
+@cached_page("services", "blog", "portfolio", "today")
 async def sitemap_xml(request: Request):
-    services = await db.get_services()
-    posts = await db.get_blog_posts(indexable_only=True)
-    categories = await db.get_portfolio_categories()
+    services, posts, categories = await asyncio.gather(
+        db.get_services(),
+        db.get_blog_posts(indexable_only=True),
+        db.get_portfolio_categories(),
+    )
     today = get_moscow_time().strftime("%Y-%m-%d")
     urls = [
         {"path": "/", "priority": "1.0", "changefreq": "weekly", "lastmod": today},
@@ -2191,99 +3883,142 @@ async def sitemap_xml(request: Request):
 @app.get("/health")
 async def health_check():
     """Проверка здоровья приложения - диагностический endpoint"""
-    logger.info("Запрос health check")
     health_status = {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "version": "1.0.0",
         "telegram_configured": bool(settings.TELEGRAM_BOT_TOKEN),
-        "database_file_exists": Path(settings.DATABASE_URL).exists()
+        "database_file_exists": Path(DATABASE_PATH).exists(),
+        "database_pool": await db.pool.check_health(),
+        "notification_outbox": await db.get_outbox_stats(),
+        "static_assets": len(static_assets),
     }
-    logger.info(f"Health check результат: {health_status}")
+    logger.debug(f"Health check результат: {health_status}")
     return health_status
 
+@app.get("/metrics")
+async def metrics():
+    """Метрики Prometheus"""
+    if prometheus_client is None:
+        raise HTTPException(status_code=404, detail="prometheus-client не установлен")
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
 @app.post("/api/booking")
-async def create_booking(booking: BookingCreate, background_tasks: BackgroundTasks):
+async def create_booking(booking: BookingCreate):
     """Создание новой заявки - основной endpoint"""
-    logger.info("Начало создания заявки")
-    logger.info(f"Данные заявки: {booking.dict()}")
-
     try:
-        # Шаг 1: Сохраняем в базу данных
-        logger.info("Сохранение заявки в базу данных...")
-        booking_id = await db.create_booking(booking)
-        logger.info(f"[OK] Заявка сохранена в БД с ID: {booking_id}")
-
-        # Шаг 2: Получаем созданную заявку для подтверждения
-        logger.info(f"Получение созданной заявки из БД...")
-        created_booking = await db.get_booking(booking_id)
-
-        if created_booking:
-            logger.info(f"[OK] Заявка подтверждена в БД: {created_booking}")
-
-            # Шаг 3: Отправляем уведомления в фоне
-            logger.info("Добавление задачи отправки Telegram уведомления в фон")
-            background_tasks.add_task(
-                telegram_service.send_booking_notification,
-                created_booking
-            )
-            logger.info("[OK] Задача Telegram уведомления добавлена в background_tasks")
-        else:
-            logger.error(f"[ERROR] Заявка с ID {booking_id} не найдена после создания!")
-
-        # Шаг 4: Возвращаем успешный ответ
-        response_data = {
-            "success": True,
-            "message": "Заявка успешно создана",
-            "booking_id": booking_id
-        }
-        logger.info(f"Отправка ответа клиенту: {response_data}")
-        return response_data
-
+        created_booking = await db.create_booking(booking, telegram_service.recipients)
     except Exception as e:
         logger.error(f"[ERROR] Критическая ошибка создания заявки: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Ошибка сервера при создании заявки")
+    notification_worker.wake()
+    logger.info(f"[OK] Заявка {created_booking['id']} сохранена")
+    return {
+        "success": True,
+        "message": "Заявка успешно создана",
+        "booking_id": created_booking["id"]
+    }
 
 @app.post("/api/quick-booking")
-async def create_quick_booking(booking: BookingCreate, background_tasks: BackgroundTasks):
+async def create_quick_booking(booking: BookingCreate):
     """Быстрая заявка - альтернативный endpoint"""
-    logger.info("Запрос быстрой заявки")
-    return await create_booking(booking, background_tasks)
+    return await create_booking(booking)
+
+# ========== АДМИНКА ==========
+ADMIN_TABS = ("settings", "home", "services", "portfolio", "reviews", "blog", "seo", "telegram")
+ADMIN_PAGED_TABS = {"portfolio", "reviews", "blog"}
+
+def paginate(rows: list, per_page: int) -> tuple[list, bool]:
+    """Отрезает лишнюю строку, запрошенную через LIMIT per_page + 1, и сообщает, есть ли следующая страница"""
+    return rows[:per_page], len(rows) > per_page
+
+async def load_admin_tab(tab: str, page: int = 1) -> dict:
+    """Данные только для одной вкладки админки; длинные списки загружаются постранично"""
+    per_page = max(1, settings.ADMIN_PAGE_SIZE)
+    page = max(1, page)
+    offset = (page - 1) * per_page
+    context = {"active_tab": tab, "page": page, "per_page": per_page, "has_next": False}
+    if tab in ("settings", "home", "seo", "telegram"):
+        context["site_settings"] = await db.get_settings()
+        if tab == "telegram":
+            context["telegram_import_mode"] = settings.TELEGRAM_IMPORT_MODE
+            context["telegram_config"] = {
+                "bot_token": bool(settings.TELEGRAM_BOT_TOKEN),
+                "channel_id": bool(settings.TELEGRAM_CHANNEL_ID),
+                "api_id": bool(settings.TELEGRAM_API_ID),
+                "api_hash": bool(settings.TELEGRAM_API_HASH),
+            }
+    elif tab == "services":
+        services, portfolio_categories, posts = await asyncio.gather(
+            db.get_services(active_only=False),
+            db.get_portfolio_categories(active_only=False),
+            db.get_blog_post_options(),
+        )
+        # Связанные данные всех услуг загружаются пачками, без запросов на каждую строку
+        service_ids = [service["id"] for service in services]
+        faq_by_service, related_by_service = await asyncio.gather(
+            db.get_service_faq_by_service_ids(service_ids, active_only=False),
+            db.get_service_related_ids_by_service_ids(service_ids),
+        )
+        for service in services:
+            service["faq"] = faq_by_service.get(service["id"], [])
+            related_ids = related_by_service.get(service["id"], {"service_ids": [], "post_ids": []})
+            service["related_service_ids"] = related_ids["service_ids"]
+            service["related_post_ids"] = related_ids["post_ids"]
+        context.update(services=services, portfolio_categories=portfolio_categories, posts=posts)
+    elif tab == "portfolio":
+        photos, portfolio_categories, services = await asyncio.gather(
+            db.get_portfolio_photos(active_only=False, limit=per_page + 1, offset=offset),
+            db.get_portfolio_categories(active_only=False),
+            db.get_services(active_only=False),
+        )
+        context["portfolio_photos"], context["has_next"] = paginate(photos, per_page)
+        context.update(portfolio_categories=portfolio_categories, services=services)
+    elif tab == "reviews":
+        reviews, services = await asyncio.gather(
+            db.get_reviews(active_only=False, limit=per_page + 1, offset=offset),
+            db.get_services(active_only=False),
+        )
+        context["reviews"], context["has_next"] = paginate(reviews, per_page)
+        context["services"] = services
+    elif tab == "blog":
+        posts, services, blog_categories = await asyncio.gather(
+            db.get_blog_posts(visible_only=False, limit=per_page + 1, offset=offset),
+            db.get_services(active_only=False),
+            db.get_blog_categories(),
+        )
+        posts, context["has_next"] = paginate(posts, per_page)
+        post_ids = [post["id"] for post in posts]
+        photos_by_post, related_by_post = await asyncio.gather(
+            db.get_blog_photos_by_post_ids(post_ids),
+            db.get_related_service_ids_by_post_ids(post_ids),
+        )
+        for post in posts:
+            post["photos"] = photos_by_post.get(post["id"], [])
+            post["related_service_ids"] = related_by_post.get(post["id"], [])
+            post["admin_label"] = admin_post_label(post)
+        context.update(posts=posts, services=services, blog_categories=blog_categories)
+    return context
 
 @app.get("/admin", response_class=HTMLResponse)
-async def admin_dashboard(request: Request, tab: str = "settings", _: str = Depends(require_admin)):
-    allowed_tabs = {"settings", "home", "services", "portfolio", "reviews", "blog", "seo", "telegram"}
-    active_tab = tab if tab in allowed_tabs else "settings"
-    site_settings = await db.get_settings()
-    posts = await db.get_blog_posts(visible_only=False)
-    for post in posts:
-        full_post = await db.get_blog_post_by_id(post["id"])
-        post["photos"] = full_post.get("photos", []) if full_post else []
-        post["related_service_ids"] = full_post.get("related_service_ids", []) if full_post else []
-        post["admin_label"] = post.get("title") or plain_excerpt(post.get("text_markdown", ""), 90) or f"Публикация {post['id']}"
-    services = await db.get_services(active_only=False)
-    for service in services:
-        service["faq"] = await db.get_service_faq(service["id"], active_only=False)
-        related_ids = await db.get_service_related_ids(service["id"])
-        service["related_service_ids"] = related_ids["service_ids"]
-        service["related_post_ids"] = related_ids["post_ids"]
-    return templates.TemplateResponse(request, "admin.html", {
-        "active_tab": active_tab,
-        "site_settings": site_settings,
-        "telegram_import_mode": settings.TELEGRAM_IMPORT_MODE,
-        "telegram_config": {
-            "bot_token": bool(settings.TELEGRAM_BOT_TOKEN),
-            "channel_id": bool(settings.TELEGRAM_CHANNEL_ID),
-            "api_id": bool(settings.TELEGRAM_API_ID),
-            "api_hash": bool(settings.TELEGRAM_API_HASH),
-        },
-        "services": services,
-        "reviews": await db.get_reviews(active_only=False),
-        "posts": posts,
-        "portfolio_categories": await db.get_portfolio_categories(active_only=False),
-        "portfolio_photos": await db.get_portfolio_photos(active_only=False, limit=30),
-        "blog_categories": await db.get_blog_categories(),
-    })
+async def admin_dashboard(request: Request, tab: str = "settings", page: int = 1, _: str = Depends(require_admin)):
+    active_tab = tab if tab in ADMIN_TABS else "settings"
+    return templates.TemplateResponse(request, "admin.html", await load_admin_tab(active_tab, page))
+
+@app.get("/admin/tabs/{tab}", response_class=HTMLResponse)
+async def admin_tab_fragment(request: Request, tab: str, page: int = 1, _: str = Depends(require_admin)):
+    """HTML-фрагмент одной вкладки для подгрузки без перезагрузки страницы"""
+    if tab not in ADMIN_TABS:
+        raise HTTPException(status_code=404, detail="Вкладка не найдена")
+    return templates.TemplateResponse(request, f"_admin_tab_{tab}.html", await load_admin_tab(tab, page))
+
+@app.get("/admin/api/{tab}")
+async def admin_tab_data(tab: str, page: int = 1, _: str = Depends(require_admin)):
+    """Данные вкладки в JSON с той же постраничной разбивкой"""
+    if tab not in ADMIN_TABS:
+        raise HTTPException(status_code=404, detail="Вкладка не найдена")
+    return await load_admin_tab(tab, page)
 
 @app.post("/admin/settings")
 async def admin_save_settings(request: Request, _: str = Depends(require_admin)):
@@ -2302,8 +4037,9 @@ async def admin_save_settings(request: Request, _: str = Depends(require_admin))
 @app.post("/admin/services/save")
 async def admin_save_service(request: Request, _: str = Depends(require_admin)):
     form_data = await request.form()
-    service_id = await db.save_service(form_data)
-    await db.save_service_extensions(service_id, form_data)
+    async with db.transaction() as tx:
+        service_id = await db.save_service(form_data, tx)
+        await db.save_service_extensions(service_id, form_data, tx)
     return RedirectResponse("/admin?tab=services", status_code=303)
 
 @app.post("/admin/services/{service_id}/delete")
@@ -2371,6 +4107,7 @@ async def admin_upload_portfolio(
         base_sort_order = 0
 
     uploaded_count = 0
+    uploaded_paths = []
     total_count = len(upload_images)
     for index, image in enumerate(upload_images):
         try:
@@ -2378,6 +4115,7 @@ async def admin_upload_portfolio(
             photo_form = dict(form)
             photo_form["sort_order"] = str(base_sort_order + index)
             await db.save_portfolio_photo(image_path, photo_form)
+            uploaded_paths.append(image_path)
             uploaded_count += 1
         except HTTPException as exc:
             detail = f"Ошибка при загрузке файла {image.filename}: {exc.detail}"
@@ -2389,6 +4127,7 @@ async def admin_upload_portfolio(
             if uploaded_count:
                 detail += f". Загружено фото до ошибки: {uploaded_count} из {total_count}"
             raise HTTPException(status_code=500, detail=detail) from exc
+    await db.create_image_variants(uploaded_paths)
     return RedirectResponse("/admin?tab=portfolio", status_code=303)
 
 @app.post("/admin/portfolio/save")
@@ -2407,14 +4146,17 @@ async def admin_save_blog(request: Request, _: str = Depends(require_admin)):
     form_payload = dict(form_data)
     form_payload["related_service_ids"] = form_data.getlist("related_service_ids")
     cover_file = form_data.get("cover_image_upload")
+    uploaded_paths = []
     if getattr(cover_file, "filename", ""):
         form_payload["cover_image"] = await save_upload(cover_file, "static/blog_photos")
+        uploaded_paths.append(form_payload["cover_image"])
     post_id = await db.save_blog_post(form_payload)
     first_uploaded_image = None
     for index, image in enumerate(form_data.getlist("images")):
         if not getattr(image, "filename", ""):
             continue
         image_path = await save_upload(image, "static/blog_photos")
+        uploaded_paths.append(image_path)
         if first_uploaded_image is None:
             first_uploaded_image = image_path
         await db.add_blog_photo(
@@ -2430,6 +4172,9 @@ async def admin_save_blog(request: Request, _: str = Depends(require_admin)):
                 cover_image = COALESCE(NULLIF(cover_image, ''), ?)
             WHERE id = ?
         """, (first_uploaded_image, first_uploaded_image, post_id))
+        await db.touch_cache("blog")
+    if uploaded_paths:
+        await db.create_image_variants(uploaded_paths)
     return RedirectResponse("/admin?tab=blog", status_code=303)
 
 @app.post("/admin/blog/categories/save")
@@ -2450,14 +4195,17 @@ async def admin_upload_blog_photos(
     _: str = Depends(require_admin),
 ):
     form = dict(await request.form())
+    uploaded_paths = []
     for index, image in enumerate(images):
         image_path = await save_upload(image, "static/blog_photos")
+        uploaded_paths.append(image_path)
         await db.add_blog_photo(
             post_id,
             image_path,
             form.get("alt_text") or "Фото к посту",
             int(form.get("sort_order") or 0) + index,
         )
+    await db.create_image_variants(uploaded_paths)
     return RedirectResponse("/admin?tab=blog", status_code=303)
 
 @app.post("/admin/blog/photos/save")
@@ -2483,7 +4231,10 @@ async def admin_delete_blog(post_id: int, _: str = Depends(require_admin)):
 @app.post("/admin/blog/import")
 async def admin_import_blog(_: str = Depends(require_admin)):
     imported = await db.import_telegram_updates()
-    logger.info(f"Telegram import completed: {imported} posts")
+    if imported is None:
+        logger.info("Импорт Telegram уже выполняется в другом процессе, ручной запуск пропущен")
+    else:
+        logger.info(f"Telegram import completed: {imported} posts")
     return RedirectResponse("/admin?tab=telegram", status_code=303)
 
 # ========== ОБРАБОТЧИКИ ОШИБОК ==========
@@ -0,0 +1,151 @@
+"""Проверка планов запросов SQLite.
+
+Скрипт поднимает приложение на временной базе, проходит по публичным страницам, админке
+и формам, записывает каждый SQL-запрос класса Database и прогоняет его через EXPLAIN QUERY PLAN.
+Если запрос публичной страницы читает растущую таблицу полным сканированием, скрипт
+завершается с кодом 1.
+
+Запуск: python check_query_plans.py [-v]
+"""
+import logging
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Таблицы, которые растут вместе с контентом; справочники (settings, services, категории) маленькие
+HOT_TABLES = {
+    "blog_posts", "blog_photos", "portfolio_photos", "reviews", "service_faq",
+    "service_related_posts", "service_related_services", "image_variants", "bookings", "notification_outbox",
+}
+PUBLIC_PAGES = [
+    "/", "/about", "/blog", "/blog?category=sovety", "/blog/plan-check-post",
+    "/portfolio", "/portfolio/vypusknoy", "/api/portfolio/vypusknoy/photos", "/uslugi/dnevnoy-makiyazh",
+    "/search?q=свадебный макияж", "/api/search?q=вопрос", "/sitemap.xml", "/robots.txt",
+]
+ADMIN_PAGES = [
+    "/admin", "/admin/tabs/services", "/admin/tabs/portfolio", "/admin/tabs/reviews", "/admin/tabs/blog",
+    "/admin/tabs/telegram", "/admin/api/blog",
+]
+SCAN_PATTERN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+
+
+def prepare_environment(workdir: str):
+    os.environ.update({
+        "DATABASE_URL": os.path.join(workdir, "plans.db"),
+        "ADMIN_USERNAME": "admin",
+        "ADMIN_PASSWORD": "plan-check",
+        "TELEGRAM_BOT_TOKEN": "",
+        "LOG_FILE": "",
+        "LOG_LEVEL": "WARNING",
+        "STATIC_INDEX_REFRESH_INTERVAL": "0",
+    })
+
+
+def collect_statements() -> tuple[str, list[tuple[str, str]]]:
+    """Прогоняет страницы через TestClient и возвращает путь к базе и пары (раздел, SQL)"""
+    workdir = tempfile.mkdtemp(prefix="plans_")
+    prepare_environment(workdir)
+    import app as appmod
+    from fastapi.testclient import TestClient
+
+    statements = []
+    section = {"name": "startup"}
+    original_connect = appmod.SQLitePool._connect
+
+    async def traced_connect(pool):
+        conn = await original_connect(pool)
+        await conn.set_trace_callback(lambda sql: statements.append((section["name"], sql)))
+        return conn
+
+    appmod.SQLitePool._connect = traced_connect
+    auth = ("admin", "plan-check")
+    with TestClient(appmod.app) as client:
+        section["name"] = "forms"
+        client.post("/admin/services/save", data={
+            "title": "Проверка планов", "slug": "plan-check-service", "is_active": "on",
+            "faq_question": "Вопрос?", "faq_answer": "Ответ.", "related_service_ids": ["1"],
+        }, auth=auth, follow_redirects=False)
+        client.post("/admin/blog/save", data={
+            "title": "Пост для проверки планов", "slug": "plan-check-post", "status": "published",
+            "text_markdown": "Текст поста. " * 40, "is_indexable": "on", "related_service_ids": ["1"],
+        }, auth=auth, follow_redirects=False)
+        client.post("/admin/reviews/save", data={"client_name": "Проверка", "text": "Отзыв", "is_active": "on"},
+                    auth=auth, follow_redirects=False)
+        client.post("/api/booking", json={"name": "Проверка", "phone": "+79161234567", "service": "Дневной макияж"})
+        section["name"] = "public"
+        # Страницы по курсору: продолжение ленты и портфолио должно идти по индексу, а не сканом
+        cursor_pages = [
+            f"/blog?after={appmod.encode_cursor('2100-01-01 00:00:00', 0)}",
+            f"/blog?category=sovety&before={appmod.encode_cursor('2000-01-01 00:00:00', 0)}",
+            f"/portfolio/vypusknoy?after={appmod.encode_cursor(0, 0)}",
+            f"/api/portfolio/vypusknoy/photos?before={appmod.encode_cursor(100, 0)}",
+        ]
+        for path in PUBLIC_PAGES + cursor_pages:
+            response = client.get(path)
+            if response.status_code != 200:
+                logger.warning(f"{path}: статус {response.status_code}")
+        section["name"] = "admin"
+        for path in ADMIN_PAGES:
+            client.get(path, auth=auth)
+    return os.environ["DATABASE_URL"], statements
+
+
+def reset_statistics(db_path: str):
+    """PRAGMA optimize при остановке пула собирает статистику по почти пустым таблицам,
+    и планировщик начинает предпочитать сканирование; для проверки нужны планы без нее"""
+    conn = sqlite3.connect(db_path)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        conn.execute("DELETE FROM sqlite_stat1")
+        conn.commit()
+    conn.close()
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> list[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+
+
+def check_query_plans(verbose: bool = False) -> int:
+    db_path, statements = collect_statements()
+    reset_statistics(db_path)
+    conn = sqlite3.connect(db_path)
+    seen = set()
+    regressions = []
+    checked = 0
+    for section, sql in statements:
+        normalized = " ".join(sql.split())
+        if not normalized.upper().startswith(EXPLAINABLE) or (section, normalized) in seen:
+            continue
+        seen.add((section, normalized))
+        try:
+            plan = explain(conn, sql)
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось построить план ({e}): {normalized[:120]}")
+            continue
+        checked += 1
+        scans = [detail for detail in plan if (match := SCAN_PATTERN.match(detail)) and match.group(1) in HOT_TABLES]
+        if scans and section == "public":
+            regressions.append((normalized, plan))
+        if verbose or scans:
+            marker = "❌" if scans and section == "public" else ("⚠️" if scans else "✅")
+            logger.info(f"{marker} [{section}] {normalized if verbose else normalized[:160]}")
+            for detail in plan:
+                logger.info(f"      {detail}")
+    conn.close()
+
+    logger.info(f"Проверено запросов: {checked}")
+    if regressions:
+        logger.error(f"❌ Полное сканирование растущих таблиц в запросах публичных страниц: {len(regressions)}")
+        return 1
+    logger.info("✅ Запросы публичных страниц используют индексы")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(check_query_plans(verbose="-v" in sys.argv[1:]))
@@ -9,12 +9,15 @@ import os
 import sys
 from pathlib import Path
 
+# Тот же файл, что открывает приложение: DATABASE_URL задается путем или в форме sqlite:///путь
+DB_PATH = os.getenv("DATABASE_URL", "tinaborke.db").removeprefix("sqlite:///")
+
 
 def clear_database():
     """Очистка всех данных из базы данных"""
 
     # Путь к базе данных
-    db_path = "tinaborke.db"
+    db_path = DB_PATH
 
     # Проверяем существование файла
     if not os.path.exists(db_path):
@@ -53,11 +56,19 @@ def clear_database():
         print()
         print("🗑️  Начинаем очистку...")
 
+        # Полнотекстовые индексы FTS5 и их служебные таблицы не чистим напрямую:
+        # индекс опустеет через триггеры вместе с исходными таблицами
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND sql LIKE 'CREATE VIRTUAL TABLE%'")
+        virtual_tables = [row[0] for row in cursor.fetchall()]
+
         for table in tables:
             table_name = table[0]
-            if table_name != "sqlite_sequence":  # Пропускаем системную таблицу
-                cursor.execute(f"DELETE FROM {table_name}")
-                print(f"✅ Очищена таблица: {table_name}")
+            if table_name == "sqlite_sequence":  # Пропускаем системную таблицу
+                continue
+            if any(table_name == name or table_name.startswith(f"{name}_") for name in virtual_tables):
+                continue
+            cursor.execute(f"DELETE FROM {table_name}")
+            print(f"✅ Очищена таблица: {table_name}")
 
         # Сбрасываем автоинкремент
         cursor.execute("DELETE FROM sqlite_sequence")
@@ -80,7 +91,7 @@ def clear_database():
 def backup_database():
     """Создание резервной копии базы данных перед очисткой"""
 
-    db_path = "tinaborke.db"
+    db_path = DB_PATH
     backup_path = "tinaborke_backup.db"
 
     if not os.path.exists(db_path):
@@ -88,8 +99,14 @@ def backup_database():
         return False
 
     try:
-        import shutil
-        shutil.copy2(db_path, backup_path)
+        # Копируем через backup API: в режиме WAL часть данных может лежать в tinaborke.db-wal
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(backup_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
         print(f"✅ Создана резервная копия: {backup_path}")
         return True
     except Exception as e:
@@ -100,7 +117,7 @@ def backup_database():
 def show_database_info():
     """Показать информацию о текущем состоянии базы данных"""
 
-    db_path = "tinaborke.db"
+    db_path = DB_PATH
 
     if not os.path.exists(db_path):
         print(f"❌ База данных {db_path} не найдена!")
@@ -1,6 +1,7 @@
 (() => {
-    const buttons = Array.from(document.querySelectorAll('.portfolio-photo'));
     const lightbox = document.getElementById('portfolioLightbox');
+    const gallery = document.querySelector('[data-lightbox-gallery]') || document;
+    let buttons = Array.from(gallery.querySelectorAll('.portfolio-photo'));
     if (!buttons.length || !lightbox) return;
 
     const image = lightbox.querySelector('.lightbox__image');
@@ -25,8 +26,12 @@
         document.body.style.overflow = '';
     }
 
-    buttons.forEach((button, buttonIndex) => {
-        button.addEventListener('click', () => show(buttonIndex));
+    // Делегирование: кнопки, догруженные прокруткой, открываются так же, как отрендеренные сервером
+    gallery.addEventListener('click', (event) => {
+        const button = event.target.closest('.portfolio-photo');
+        if (!button) return;
+        const buttonIndex = buttons.indexOf(button);
+        if (buttonIndex !== -1) show(buttonIndex);
     });
 
     closeButton.addEventListener('click', close);
@@ -53,4 +58,65 @@
         if (Math.abs(delta) < 40) return;
         show(delta > 0 ? index - 1 : index + 1);
     }, { passive: true });
+
+    // Бесконечная прокрутка: ссылка «Показать еще» остается обычной ссылкой без JS
+    const moreLink = document.querySelector('[data-portfolio-more]');
+    if (!moreLink || !moreLink.dataset.api || gallery === document) return;
+    let loading = false;
+
+    function createPhotoButton(photo) {
+        const button = document.createElement('button');
+        button.className = 'portfolio-photo';
+        button.type = 'button';
+        button.dataset.full = photo.image_path;
+        button.dataset.alt = photo.alt;
+        const img = document.createElement('img');
+        img.src = photo.image_path;
+        if (photo.srcset) {
+            img.srcset = photo.srcset;
+            img.sizes = '(max-width: 640px) 50vw, 33vw';
+        }
+        img.alt = photo.alt;
+        img.loading = 'lazy';
+        button.appendChild(img);
+        return button;
+    }
+
+    async function loadMore() {
+        if (loading || !moreLink.dataset.api) return;
+        loading = true;
+        try {
+            const response = await fetch(moreLink.dataset.api, { headers: { Accept: 'application/json' } });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const page = await response.json();
+            page.photos.forEach((photo) => gallery.appendChild(createPhotoButton(photo)));
+            buttons = Array.from(gallery.querySelectorAll('.portfolio-photo'));
+            if (page.next_api_url) {
+                moreLink.dataset.api = page.next_api_url;
+                moreLink.href = page.next_url;
+            } else {
+                moreLink.remove();
+                if (observer) observer.disconnect();
+            }
+        } catch (error) {
+            // При ошибке ссылка продолжает работать как обычный переход на следующую страницу
+            delete moreLink.dataset.api;
+            if (observer) observer.disconnect();
+        } finally {
+            loading = false;
+        }
+    }
+
+    moreLink.addEventListener('click', (event) => {
+        if (!moreLink.dataset.api) return;
+        event.preventDefault();
+        loadMore();
+    });
+
+    const observer = 'IntersectionObserver' in window
+        ? new IntersectionObserver((entries) => {
+            if (entries.some((entry) => entry.isIntersecting)) loadMore();
+        }, { rootMargin: '400px 0px' })
+        : null;
+    if (observer) observer.observe(moreLink);
 })();